@@ -0,0 +1,80 @@
+"""
+Compare the template interpreter with compiled render functions
+
+Renders the entity header partial of the example library for a synthetic
+entity with many generics and ports, once interpreted and once compiled
+(see template.Compiler), checks that both outputs are identical and
+prints the best time of several runs for each.
+
+  python benchmarks/bench_compile.py [--ports N] [--repeat R]
+"""
+import argparse
+from pathlib import Path
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from dfaccto_tpl.template import compile_template, parse
+
+
+Root = Path(__file__).resolve().parents[1]
+TemplatePath = Root / 'example' / 'lib' / 'tpl' / 'generic' / 'entity_header.part.tpl'
+
+
+def make_type(name):
+  return {'qualified': name, 'qualified_v': name + '_v',
+          'qualified_ms': name + '_ms', 'qualified_sm': name + '_sm',
+          'qualified_v_ms': name + '_v_ms', 'qualified_v_sm': name + '_v_sm',
+          'x_format': '{{.}}'}
+
+def make_port(idx, count):
+  size = ({'is_literal': True, 'value': 4 + idx % 8} if idx % 3 == 1 else
+          {'is_literal': False, 'qualified': 'Size{:d}'.format(idx % 5)})
+  return {'identifier': 'p_port{:d}'.format(idx),
+          'identifier_ms': 'pm_port{:d}_ms'.format(idx),
+          'identifier_sm': 'pm_port{:d}_sm'.format(idx),
+          'mode': 'in' if idx % 2 else 'out', 'mode_ms': 'out', 'mode_sm': 'in',
+          'is_complex': idx % 4 == 0,
+          'is_scalar': idx % 3 == 0,
+          'type': make_type('t_Type{:d}'.format(idx % 7)),
+          'size': size,
+          '_last': idx == count - 1}
+
+def make_entity(ports):
+  generics = [dict(make_port(idx, 8), identifier='g_Generic{:d}'.format(idx)) for idx in range(8)]
+  return {'identifier': 'Synthetic',
+          'generics': generics,
+          'ports': [make_port(idx, ports) for idx in range(ports)]}
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Compare interpreted and compiled template rendering')
+  parser.add_argument('--ports', type=int, default=5000, help='number of entity ports (default: 5000)')
+  parser.add_argument('--repeat', type=int, default=5, help='number of timed runs (default: 5)')
+  args = parser.parse_args()
+
+  source = TemplatePath.read_text()
+  entity = make_entity(args.ports)
+  interpreted = parse(source, 'interpreted')
+  compiled = compile_template(parse(source, 'compiled'))
+  if not compiled.is_compiled:
+    print('Template could not be compiled')
+    return 1
+
+  expected = interpreted.render(entity)
+  if compiled.render(entity) != expected:
+    print('Outputs differ')
+    return 1
+
+  print('{:d} ports, {:d} bytes of output, best of {:d} runs'.format(args.ports, len(expected), args.repeat))
+  times = dict()
+  for label, template in (('interpreted', interpreted), ('compiled', compiled)):
+    times[label] = min(timeit.repeat(lambda: template.render(entity), number=1, repeat=args.repeat))
+    print('  {:<12s} {:.3f}s'.format(label, times[label]))
+  print('  speedup      {:.2f}x'.format(times['interpreted'] / times['compiled']))
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
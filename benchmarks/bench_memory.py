@@ -0,0 +1,82 @@
+"""
+Measure the memory footprint of the model of a synthetic design
+
+Builds a design of N leaf entities with a generic and five ports each,
+and a top entity which instantiates every leaf K times, reads it with
+the ConfigReader and freezes it. Prints the memory allocated while doing
+so (see tracemalloc), the number of model elements by class and the
+resulting bytes per element.
+
+  python benchmarks/bench_memory.py [--leaves N] [--instances K]
+"""
+import argparse
+from collections import Counter
+import gc
+from pathlib import Path
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from dfaccto_tpl.cmdline import Cmdline
+from dfaccto_tpl.configreader import ConfigReader
+from dfaccto_tpl.element import Element
+
+
+Root = Path(__file__).resolve().parents[1]
+
+Design = """
+Inc('definitions.py', abs='lib')
+for i in range({leaves:d}):
+  Ent('Leaf{{}}'.format(i),
+      Generic('DataWidth', T('Size')),
+      PortS('hsIn',    T('Handshake', pkg='types')),
+      PortM('hsOut',   T('Handshake', pkg='types')),
+      PortI('dataIn',  T('Data', pkg='types'), vector='DataWidth'),
+      PortO('dataOut', T('Data', pkg='types'), vector='DataWidth'),
+      PortO('done',    T('Logic')))
+with Ent('Top', Generic('DataWidth', T('Size')), PortI('dataIn', T('Data'), vector='DataWidth')):
+  for i in range({leaves:d}):
+    for k in range({instances:d}):
+      Ins('Leaf{{}}'.format(i), 'l{{}}_{{}}'.format(i, k),
+          MapPort('hsIn',  S('hs{{}}_{{}}'.format(i, k))),
+          MapPort('hsOut', S('hs{{}}_{{}}'.format(i + 1, k))),
+          MapPort('dataIn', S('dataIn')),
+          MapPort('done', S('done{{}}_{{}}'.format(i, k))))
+"""
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Measure the model memory per element of a synthetic design')
+  parser.add_argument('--leaves', type=int, default=3000, help='number of leaf entities (default: 3000)')
+  parser.add_argument('--instances', type=int, default=1, help='instances of each leaf in the top entity (default: 1)')
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    cfgdir = Path(tmp) / 'cfg'
+    cfgdir.mkdir()
+    (cfgdir / 'design.py').write_text(Design.format(leaves=args.leaves, instances=args.instances))
+    cmdline = Cmdline.parse(['-o', str(Path(tmp) / 'out'), '-e', 'design.py', '-c', str(cfgdir),
+                             '-m', 'lib', '-c', str(Root / 'example' / 'lib' / 'cfg')])
+
+    gc.collect()
+    tracemalloc.start()
+    reader = ConfigReader(cmdline)
+    reader.read(cmdline.entry(), abs=True)
+    context = reader.context
+    context.freeze()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+  counts = Counter(type(obj).__name__ for obj in gc.get_objects() if isinstance(obj, Element))
+  elements = sum(counts.values())
+  for name, count in sorted(counts.items()):
+    print('{:>14s} {:8d}'.format(name, count))
+  print('{:d} leaves x {:d} instances: {:d} elements, {:.1f} MB, {:.0f} bytes per element'.format(
+    args.leaves, args.instances, elements, size / 1e6, size / elements))
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Measure the template parse throughput
+
+Parses all templates found in the given directories (default: the
+example templates) several times over with the current template.Parser
+and with the baseline _split/_filter parser (see baseline_parser.py)
+and prints the best time of several runs and the throughput of each.
+
+  python benchmarks/bench_parse.py [--passes P] [--repeat R] [DIR...]
+"""
+import argparse
+from pathlib import Path
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from baseline_parser import Parser as BaselineParser
+from dfaccto_tpl.template import Parser
+
+
+Root = Path(__file__).resolve().parents[1]
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Measure template parse throughput')
+  parser.add_argument('dirs', nargs='*', type=Path, default=[Root / 'example'],
+                      help='directories to search for *.tpl files (default: example)')
+  parser.add_argument('--passes', type=int, default=100, help='parse each template this often per run (default: 100)')
+  parser.add_argument('--repeat', type=int, default=5, help='number of timed runs (default: 5)')
+  args = parser.parse_args()
+
+  sources = [path.read_text() for base in args.dirs for path in sorted(base.rglob('*.tpl'))]
+  if not sources:
+    print('No templates found')
+    return 1
+  size = sum(len(source) for source in sources) * args.passes
+
+  print('{:d} templates, {:.2f} MB per run, best of {:d} runs'.format(len(sources), size / 1e6, args.repeat))
+  times = dict()
+  for label, tpl_parser in (('baseline', BaselineParser()), ('current', Parser())):
+    def run():
+      for _ in range(args.passes):
+        for source in sources:
+          tpl_parser.parse(source)
+    times[label] = min(timeit.repeat(run, number=1, repeat=args.repeat))
+    print('  {:<10s} {:.3f}s {:6.2f} MB/s'.format(label, times[label], size / 1e6 / times[label]))
+  print('  speedup    {:.2f}x'.format(times['baseline'] / times['current']))
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
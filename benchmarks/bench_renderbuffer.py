@@ -0,0 +1,84 @@
+"""
+Compare the RenderBuffer with the baseline buffer on deeply indented output
+
+Renders a recursive partial tree: every node is rendered by a partial
+nested in indented lines of its parent, and each of its rows by another
+partial, so the output is deeply indented and most writes happen inside
+partials. The tree is rendered once into the current RenderBuffer and
+once into the previous buffer (see baseline_renderbuffer.py), the
+outputs are checked to be identical and the best time of several runs
+is printed for each.
+
+  python benchmarks/bench_renderbuffer.py [--depth D] [--fanout F] [--rows R] [--repeat N]
+"""
+import argparse
+from pathlib import Path
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from baseline_renderbuffer import RenderBuffer as BaselineRenderBuffer
+from dfaccto_tpl.template import Context, parse
+from dfaccto_tpl.template.renderbuffer import RenderBuffer
+
+
+NodeTemplate = '''\
+{{name}}: begin
+  {{#rows}}
+  -- {{>row}}
+  {{/rows}}
+  {{#children}}
+  | {{>node}}
+  {{/children}}
+{{name}}: end
+'''
+
+RowTemplate = '''\
+{{key}}	=> {{value}};
+   continued {{value}}
+'''
+
+
+def make_node(name, depth, fanout, rows):
+  return {'name': name,
+          'rows': [{'key': 'k{:d}'.format(idx), 'value': 'v{:d}\nmore'.format(idx)} for idx in range(rows)],
+          'children': [make_node('{}.{:d}'.format(name, idx), depth - 1, fanout, rows)
+                       for idx in range(fanout)] if depth > 0 else []}
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Compare RenderBuffer with the baseline buffer')
+  parser.add_argument('--depth', type=int, default=6, help='depth of the partial tree (default: 6)')
+  parser.add_argument('--fanout', type=int, default=3, help='children per node (default: 3)')
+  parser.add_argument('--rows', type=int, default=2, help='row partials per node (default: 2)')
+  parser.add_argument('--repeat', type=int, default=5, help='number of timed runs (default: 5)')
+  args = parser.parse_args()
+
+  templates = {'node': parse(NodeTemplate, 'node'), 'row': parse(RowTemplate, 'row')}
+  for template in templates.values():
+    template.link(lambda name, template: templates.get(name))
+  root = make_node('n', args.depth, args.fanout, args.rows)
+
+  def render(buffer_type):
+    buf = buffer_type()
+    templates['node'].render_with(Context(root), buf)
+    return buf.finish()
+
+  expected = render(BaselineRenderBuffer)
+  if render(RenderBuffer) != expected:
+    print('Outputs differ')
+    return 1
+
+  print('depth {:d}, fanout {:d}, {:d} bytes of output, best of {:d} runs'.format(
+      args.depth, args.fanout, len(expected), args.repeat))
+  times = dict()
+  for label, buffer_type in (('baseline', BaselineRenderBuffer), ('current', RenderBuffer)):
+    times[label] = min(timeit.repeat(lambda: render(buffer_type), number=1, repeat=args.repeat))
+    print('  {:<10s} {:.3f}s'.format(label, times[label]))
+  print('  speedup    {:.2f}x'.format(times['baseline'] / times['current']))
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
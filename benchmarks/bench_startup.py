@@ -0,0 +1,64 @@
+"""
+Measure the startup time of the dfaccto_tpl command line
+
+Runs "python -m dfaccto_tpl" in a subprocess several times for each
+scenario and prints the median time until the first byte of output and
+until the process exits. The scenarios are a bare interpreter for
+reference, --help, a full render of the example and a no-op incremental
+render of the example which loads the model from a snapshot.
+
+  python benchmarks/bench_startup.py [--repeat R]
+"""
+import argparse
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+Root = Path(__file__).resolve().parents[1]
+Example = Root / 'example'
+
+
+def measure(argv, repeat):
+  """Return the median (time to first output, total time) of running argv"""
+  first = list()
+  total = list()
+  for _ in range(repeat):
+    start = time.perf_counter()
+    proc = subprocess.Popen(argv, cwd=str(Root), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    proc.stdout.read(1)
+    first.append(time.perf_counter() - start)
+    proc.stdout.read()
+    proc.wait()
+    total.append(time.perf_counter() - start)
+  return statistics.median(first), statistics.median(total)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Measure the startup time of python -m dfaccto_tpl')
+  parser.add_argument('--repeat', type=int, default=15, help='runs per scenario (default: 15)')
+  args = parser.parse_args()
+
+  command = [sys.executable, '-m', 'dfaccto_tpl']
+  example = ['-e', 'simple.py', '-c', str(Example / 'cfg'), '-t', str(Example / 'tpl'),
+             '-m', 'lib', '-c', str(Example / 'lib' / 'cfg'), '-t', str(Example / 'lib' / 'tpl')]
+  with tempfile.TemporaryDirectory() as tmp:
+    incremental = command + example + ['-o', str(Path(tmp) / 'inc'), '--incremental',
+                                       '--snapshot', str(Path(tmp) / 'snapshot')]
+    subprocess.run(incremental, cwd=str(Root), stdout=subprocess.DEVNULL, check=True)
+    scenarios = [
+      ('python -c "print()"', [sys.executable, '-c', 'print()']),
+      ('--help', command + ['--help']),
+      ('example', command + example + ['-o', str(Path(tmp) / 'full')]),
+      ('example, incremental no-op', incremental)]
+    print('{:<28s} {:>12s} {:>12s}'.format('', 'first output', 'total'))
+    for name, argv in scenarios:
+      first, total = measure(argv, args.repeat)
+      print('{:<28s} {:>10.1f}ms {:>10.1f}ms'.format(name, first * 1e3, total * 1e3))
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Compare the token trees of the template parser with the baseline parser
+
+Parses a corpus with the current template.Parser and with the previous
+_split/_filter parser (see baseline_parser.py) and reports every
+template for which the token trees or the raised errors differ.
+The corpus consists of the templates found in the given directories
+(default: the example templates), a set of hand-written edge cases and
+randomly generated templates, a quarter of which are damaged to be
+(mostly) invalid.
+
+Invalid tokens are reported at their own position by the current parser
+and at the last emitted item by the baseline parser, so only the
+messages of errors are compared, not their positions.
+
+  python benchmarks/parse_corpus.py [--random N] [--seed S] [DIR...]
+"""
+import argparse
+from pathlib import Path
+import random
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from baseline_parser import Parser as BaselineParser
+from dfaccto_tpl.template import (Parser, ParserError, LiteralToken, ValueToken,
+                                  IndirectToken, PartialToken, SectionToken)
+
+
+Root = Path(__file__).resolve().parents[1]
+
+EdgeCases = [
+  '', '\n', '\r\n', '\r', 'text', 'text\n', '\n\n\r\n\r',
+  '{{a}}', '{{ a }}', '{{&a}}', '{{*a}}', '{{>part}}', '{{;comment}}',
+  '{{#a}}{{/a}}', '{{#a}}\n{{/a}}\n', '  {{#a}}  \n  x\n  {{/a}}  \n',
+  '\t{{#a}}\r\nx\r{{/a}}', '{{#a}}x{{|a}}y{{/a}}', '{{=a}}\n{{|a}}\n{{/a}}',
+  '{{?a.b}}{{.}}{{/a.b}}', '{{!..}}x{{/..}}', '{{^a}}\n x\n{{/a}}',
+  'x {{#a}}\n{{/a}} y', '{{#a}}{{#b}}\n{{/b}}{{/a}}', '  {{>part}}  \n',
+  '  {{;comment}}\n', '{{;a}}{{;b}}\n', '{{a}}{{b}}\n{{c}}',
+  '{{#a}}', '{{/a}}', '{{#a}}{{/b}}', '{{|a}}', '{{^a}}{{|a}}{{/a}}',
+  '{{#a}}{{|a}}{{|a}}{{/a}}', '{{}}', '{{#}}', '{{a b}}', '{{@a}}',
+  '{{a}', 'x\n{{a b}}', 'x\n  {{#a}}\n{{/b}}\n',
+]
+
+Keys = ['a', 'b', 'a.b', '.', '..', '..a', "a'", 'a+', '0']
+BadKeys = ['a b', '', '.a.']
+Types = ['', '&', '*', '>', ';']
+SectionTypes = ['#', '=', '?', '!', '^']
+Literals = ['x', 'text', ' ', '  ', '\t', ' \t ', '\n', '\n', '\r\n', '\r']
+
+
+def random_token(rnd, kind, key):
+  return '{{{{{}{}{}{}}}}}'.format(kind, rnd.choice(('', ' ')), key, rnd.choice(('', ' ')))
+
+def random_template(rnd, items, depth=0):
+  """Generate a valid template of literals, tokens and nested sections"""
+  parts = list()
+  for _ in range(rnd.randrange(items)):
+    choice = rnd.random()
+    if choice < 0.45:
+      parts.append(rnd.choice(Literals))
+    elif choice < 0.75 or depth > 3:
+      parts.append(random_token(rnd, rnd.choice(Types), rnd.choice(Keys)))
+    else:
+      kind = rnd.choice(SectionTypes)
+      key = rnd.choice(Keys)
+      ws = rnd.choice(('', '\n', '  ', ' \n'))
+      parts.append(ws + random_token(rnd, kind, key) + rnd.choice(('', '\n', ' \r\n')))
+      parts.append(random_template(rnd, items // 2, depth + 1))
+      if kind != '^' and rnd.random() < 0.3:
+        parts.append(ws + random_token(rnd, '|', key) + rnd.choice(('', '\n')))
+        parts.append(random_template(rnd, items // 2, depth + 1))
+      parts.append(ws + random_token(rnd, '/', key) + rnd.choice(('', '\n', '\r')))
+  return ''.join(parts)
+
+def damage(rnd, string):
+  """Insert a bad key, an unknown token type, an unbalanced section token or a brace"""
+  pos = rnd.randrange(len(string) + 1)
+  bad = rnd.choice((random_token(rnd, rnd.choice(SectionTypes + ['|', '/', '@']), rnd.choice(Keys + BadKeys)),
+                    '{', '}'))
+  return string[:pos] + bad + string[pos:]
+
+
+def dump(content):
+  """Return a comparable nested tuple representation of a token list"""
+  items = list()
+  for token in content or ():
+    if isinstance(token, LiteralToken):
+      items.append(('Literal', token.string))
+    elif isinstance(token, ValueToken):
+      items.append(('Value', str(token.key), token.verbatim))
+    elif isinstance(token, IndirectToken):
+      items.append(('Indirect', str(token._key)))
+    elif isinstance(token, PartialToken):
+      items.append(('Partial', token.name))
+    elif isinstance(token, SectionToken):
+      items.append(('Section', str(token.key), token.mode,
+                    dump(token.truthy_content), None if token.falsey_content is None else dump(token.falsey_content)))
+    else:
+      items.append(('Unknown', type(token).__name__))
+  return tuple(items)
+
+
+def outcome(parser, string):
+  try:
+    return ('Tokens', dump(parser.parse(string).content))
+  except ParserError as e:
+    return ('ParserError', e._msg)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Compare token trees with the baseline template parser')
+  parser.add_argument('dirs', nargs='*', type=Path, default=[Root / 'example'],
+                      help='directories to search for *.tpl files (default: example)')
+  parser.add_argument('--random', type=int, default=5000, help='number of random templates (default: 5000)')
+  parser.add_argument('--seed', type=int, default=0, help='seed for random templates (default: 0)')
+  args = parser.parse_args()
+
+  corpus = [(str(path), path.read_text()) for base in args.dirs for path in sorted(base.rglob('*.tpl'))]
+  corpus.extend(('edge case {:d}'.format(idx), string) for idx, string in enumerate(EdgeCases))
+  rnd = random.Random(args.seed)
+  for idx in range(args.random):
+    string = random_template(rnd, 12)
+    if rnd.random() < 0.25:
+      string = damage(rnd, string)
+    corpus.append(('random {:d}'.format(idx), string))
+
+  current = Parser()
+  baseline = BaselineParser()
+  differ = 0
+  errors = 0
+  for name, string in corpus:
+    expected = outcome(baseline, string)
+    errors += expected[0] == 'ParserError'
+    if outcome(current, string) != expected:
+      differ += 1
+      print('Differs: {} {!r}'.format(name, string))
+  print('{:d} templates ({:d} invalid), {:d} differ'.format(len(corpus), errors, differ))
+  return 1 if differ else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
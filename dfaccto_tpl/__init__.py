@@ -1,23 +1,43 @@
-from .context import Context
-from .element import Element, EntityElement, PackageElement
-from .package import Package
-from .constant import Constant
-from .type import Type
-from .entity import Entity, Instance
-from .generic import Generic, InstGeneric
-from .port import Port, InstPort
-from .signal import Signal
-
-from .role import Role
-from .hasprops import HasProps
-from .typed import Typed
-from .assignment import Assignment
-from .assignable import Assignable, ConstAssignable
-from .util import DFACCTOError, IndexWrapper, Registry, DeferredValue # safe_str, cached_property, IndexedObj, UnionFind
-
-from .configreader import ConfigReader
-from .contextrenderer import ContextRenderer
-from .frontend import Frontend # Decoder, ElementWrapper
+from importlib import import_module
+
+
+# public names and their submodules, imported on first access (see __getattr__),
+# so that e.g. "python -m dfaccto_tpl" only loads what a run actually needs
+_exports = {
+  'Context': 'context',
+  'Element': 'element', 'EntityElement': 'element', 'PackageElement': 'element',
+  'Package': 'package',
+  'Constant': 'constant',
+  'Type': 'type',
+  'Entity': 'entity', 'Instance': 'entity',
+  'Generic': 'generic', 'InstGeneric': 'generic',
+  'Port': 'port', 'InstPort': 'port',
+  'Signal': 'signal',
+
+  'Role': 'role',
+  'HasProps': 'hasprops',
+  'Typed': 'typed',
+  'Assignment': 'assignment',
+  'Assignable': 'assignable', 'ConstAssignable': 'assignable',
+  'DFACCTOError': 'util', 'IndexWrapper': 'util', 'Registry': 'util', 'DeferredValue': 'util', # safe_str, cached_property, IndexedObj
+
+  'ConfigReader': 'configreader',
+  'ContextRenderer': 'contextrenderer',
+  'Frontend': 'frontend', # Decoder, ElementWrapper
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+  if name not in _exports:
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+  value = getattr(import_module('.' + _exports[name], __name__), name)
+  globals()[name] = value
+  return value
+
+def __dir__():
+  return sorted(set(globals()) | set(_exports))
 
 
 __version__ = '1.0'
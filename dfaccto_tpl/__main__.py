@@ -1,55 +1,147 @@
-import argparse
+from functools import partial
 from itertools import chain
-from pathlib import Path
-import re
 import sys
-import shutil
-import traceback
+import time
 
 from .cmdline import Cmdline
-from .configreader import ConfigReader
-from .contextrenderer import ContextRenderer
 from .util import DFACCTOError
 
+# further modules are imported where needed, as runs that load a
+# snapshot or find all outputs current only need a small part of them
 
-def print_status(inspec, outspec, element=None):
+
+def print_status(inspec, outspec, element=None, status=None):
   inname = '{}:{}'.format(inspec.module or '', inspec.name)
   outname = '{}:{}'.format(outspec.module or '', outspec.name)
   if element is not None:
     elementname = '{}:{}'.format(type(element).__name__, str(element))
   else:
     elementname = ''
-  print('{:>32s} ---{:-^32s}---> {:<32s}'.format(inname, elementname, outname))
+  status_str = ' ({})'.format(status) if status is not None else ''
+  print('{:>32s} ---{:-^32s}---> {:<32s}{}'.format(inname, elementname, outname, status_str))
 
-def main():
-  args = Cmdline.parse()
-  try:
-    reader = ConfigReader(args)
-    reader.read(args.entry(), abs=True)
+def read_model(args, snapshot):
+  # returns the frozen context and the config scripts it was built from
+  loaded = snapshot.load() if snapshot is not None else None
+  if loaded is not None:
+    return loaded
+  from .configreader import ConfigReader
+  reader = ConfigReader(args)
+  reader.read(args.entry(), abs=True)
+  context = reader.context
+  context.freeze()
+  if snapshot is not None:
+    snapshot.store(context, reader.scripts)
+  return context, reader.scripts
 
-    context = reader.context
-    if args.debug():
-      breakpoint()
+def collect_jobs(context):
+  element_iter = chain((context,), context.packages.contents(), context.entities.contents())
+  return [(tpl_spec, out_spec, element)
+          for element in element_iter
+          for tpl_spec,out_spec in element.props.get('templates', {}).items()]
 
-    renderer = ContextRenderer(args)
+def render_all(renderer, jobs, args, quiet_current=False):
+  for (tpl_spec, out_spec, element), status in renderer.render_jobs(jobs, args.jobs()):
+    if quiet_current and status == type(renderer).Current:
+      continue
+    print_status(tpl_spec, out_spec, element, status if status != type(renderer).Rendered else None)
+  renderer.write_rendered()
 
-    renderer.empty()
+def print_error(e):
+  if isinstance(e, DFACCTOError):
+    print(e, file=sys.stderr)
+  else:
+    import traceback
+    print('Unexpected error:', file=sys.stderr)
+    traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
 
-    element_iter = chain((context,), context.packages.contents(), context.entities.contents())
-    for element in element_iter:
-      for tpl_spec,out_spec in element.props.get('templates', {}).items():
-        renderer.render(tpl_spec, out_spec, element)
-        print_status(tpl_spec, out_spec, element)
+def watch(args, snapshot):
+  """
+    Render, then render again whenever watched files change, until interrupted
 
-    renderer.write_rendered()
+    Changes to config scripts, or files added to or removed from config
+    directories, rebuild the model and render all outputs. Other changes
+    only render the outputs using a changed template or partial again.
+    Parsed templates are kept between passes unless they changed.
+  """
+  from .contextrenderer import ContextRenderer
+  from .watch import Watcher, affects_config
+  watcher = Watcher(chain.from_iterable(chain(args.cfgdirs(module), args.tpldirs(module))
+                                        for module in args.modules()),
+                    exclude=(args.outdir(),))
+  cfgdirs = [cfgdir for module in args.modules() for cfgdir in args.cfgdirs(module)]
+  renderer = None
+  context = jobs = None
+  scripts = ()
+  outdated = None # render all outputs
+  while True:
+    try:
+      start = time.perf_counter()
+      if context is None:
+        context, scripts = read_model(args, snapshot)
+        jobs = collect_jobs(context)
+        watcher.add_files(scripts)
+      if renderer is None:
+        renderer = ContextRenderer(args, scripts)
+      else:
+        renderer.restart(scripts, outdated)
+      render_all(renderer, jobs, args, quiet_current=outdated is not None)
+      print('Done in {:.3f}s, watching for changes...'.format(time.perf_counter() - start), file=sys.stderr)
+      outdated = set()
+    except Exception as e:
+      print_error(e)
+      outdated = None # render all outputs after the next change
 
-  except DFACCTOError as e:
-    print(e, file=sys.stderr)
-    return 1
+    try:
+      modified, added, removed = watcher.wait()
+    except KeyboardInterrupt:
+      return 0
+    args.refresh_paths()
+    if renderer is not None:
+      dropped = renderer.invalidate(chain(modified, added, removed))
+      if outdated is not None:
+        outdated = dropped
+    if affects_config((modified, added, removed), scripts, cfgdirs):
+      context = None # rebuild the model
+      outdated = None
+
+def main(argv=None, cache=None):
+  """
+    Run the command line argv (default: sys.argv)
+
+    A RenderCache keeps models and parsed templates for later calls.
+  """
+  args = Cmdline.parse(argv)
+  if args.snapshot() is not None:
+    from .snapshot import ModelSnapshot
+    snapshot = ModelSnapshot(args.snapshot(), args)
+  else:
+    snapshot = None
+  if args.watch() and cache is None:
+    try:
+      return watch(args, snapshot)
+    except KeyboardInterrupt:
+      return 0
+  try:
+    if cache is not None:
+      if args.watch() or args.debug():
+        raise DFACCTOError('Error: --watch and --debug are not supported by the render server')
+      context, scripts = cache.model(args, partial(read_model, args, snapshot))
+      renderer = cache.renderer(args, scripts)
+    else:
+      context, scripts = read_model(args, snapshot)
+      if args.debug():
+        breakpoint()
+
+      from .contextrenderer import ContextRenderer
+      renderer = ContextRenderer(args, scripts)
+
+    renderer.empty()
+
+    render_all(renderer, collect_jobs(context), args)
 
   except Exception as e:
-    print('Unexpected error:', file=sys.stderr)
-    traceback.print_exc(file=sys.stderr)
+    print_error(e)
     return 1
 
   return 0
@@ -57,4 +149,3 @@ def main():
 
 if __name__ == "__main__":
   sys.exit(main())
-
@@ -1,24 +1,31 @@
-from collections import defaultdict
-
 from .util import DFACCTOError
 
 
 
 class Assignable:
   def __init__(self, is_literal=False):
-    self._assignments = defaultdict(list)
+    self._assignments = None # role -> [(container, idx)], allocated on first assignment
     self._is_literal = is_literal
 
   @property
   def is_literal(self):
     return self._is_literal
 
+  @property
+  def assigned_containers(self):
+    """(container, idx) pairs of all assignments, grouped by role"""
+    if self._assignments is None:
+      return []
+    return [item for items in self._assignments.values() for item in items]
+
   def assigned_to(self, container, idx=None):
     role = container.role
-    if not role.is_const and self._assignments[role]:
+    if self._assignments is None:
+      self._assignments = dict()
+    if not role.is_const and self._assignments.get(role):
       msg = '{} can not be assigned to multiple elements of role {}'
       raise DFACCTOError(msg.format(self, role.name))
-    self._assignments[role].append((container, idx))
+    self._assignments.setdefault(role, []).append((container, idx))
 
 
 class ConstAssignable(Assignable):
@@ -0,0 +1,49 @@
+import json
+import os
+import socket
+import sys
+
+
+
+def request(path, argv, cwd=None):
+  """
+    Send the dfaccto_tpl command line argv to the render server at path
+
+    Returns (status, stdout, stderr) of the request. The server handles
+    one request at a time, so this waits for requests of other clients.
+    raises OSError if no server is listening at path
+  """
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    sock.connect(str(path))
+    sock.sendall(json.dumps({'argv': list(argv), 'cwd': cwd or os.getcwd()}).encode())
+    sock.shutdown(socket.SHUT_WR)
+    chunks = list()
+    while chunk := sock.recv(65536):
+      chunks.append(chunk)
+  reply = json.loads(b''.join(chunks).decode())
+  return reply['status'], reply['stdout'], reply['stderr']
+
+
+def main(argv=None):
+  argv = sys.argv[1:] if argv is None else argv
+  if not argv or argv[0] in ('-h', '--help'):
+    print('usage: dfaccto_tpl.client <socket> <dfaccto_tpl arguments>...\n\n'
+          'Render through the dfaccto_tpl.server listening on <socket>,\n'
+          'or in this process if no server is listening.\n'
+          'The server handles one request at a time, concurrent clients wait for their turn.', file=sys.stderr)
+    return 2
+  try:
+    status, stdout, stderr = request(argv[0], argv[1:])
+  except (FileNotFoundError, ConnectionRefusedError):
+    from .__main__ import main as render_main
+    return render_main(argv[1:])
+  except (OSError, ValueError, KeyError) as e:
+    print('Error: request to server at "{}" failed: {}'.format(argv[0], e), file=sys.stderr)
+    return 1
+  sys.stdout.write(stdout)
+  sys.stderr.write(stderr)
+  return status
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -1,9 +1,11 @@
 import argparse
 from functools import partial
+from io import DEFAULT_BUFFER_SIZE
+import os
 from pathlib import Path
 import re
 
-from .util import DFACCTOError
+from .util import DFACCTOError, SearchPath
 
 
 def path_arg(arg, dir=True, exist=False):
@@ -32,6 +34,16 @@ def path_arg(arg, dir=True, exist=False):
     return path
 
 
+def int_arg(arg, min=None):
+  try:
+    value = int(arg)
+  except ValueError:
+    raise argparse.ArgumentTypeError('{} is not an integer'.format(arg))
+  if min is not None and value < min:
+    raise argparse.ArgumentTypeError('{} must be at least {}'.format(value, min))
+  return value
+
+
 def str_arg(arg, regex=re.compile('.*')):
   if not regex.match(arg):
     raise argparse.ArgumentTypeError('{} is an invalid string'.format(arg))
@@ -45,15 +57,25 @@ class Cmdline:
   KEY_OUTDIR     = '_outdir_'
   KEY_OUTLIST    = '_outlist_'
   KEY_DEBUG      = '_debug_'
+  KEY_CACHEDIR   = '_cachedir_'
+  KEY_NOCACHE    = '_nocache_'
+  KEY_COMPILE    = '_compile_'
+  KEY_BUFSIZE    = '_bufsize_'
+  KEY_JOBS       = '_jobs_'
+  KEY_INCREMENTAL = '_incremental_'
+  KEY_WRITECHANGED = '_writechanged_'
+  KEY_CHANGEDLIST = '_changedlist_'
+  KEY_SNAPSHOT   = '_snapshot_'
+  KEY_WATCH      = '_watch_'
   MODULE_KEYS = (KEY_CFGDIRS, KEY_TPLDIRS)
-  GLOBAL_KEYS = (KEY_ENTRY, KEY_OUTDIR, KEY_OUTLIST, KEY_DEBUG)
+  GLOBAL_KEYS = (KEY_ENTRY, KEY_OUTDIR, KEY_OUTLIST, KEY_DEBUG, KEY_CACHEDIR, KEY_NOCACHE, KEY_COMPILE, KEY_BUFSIZE, KEY_JOBS, KEY_INCREMENTAL, KEY_WRITECHANGED, KEY_CHANGEDLIST, KEY_SNAPSHOT, KEY_WATCH)
 
   class SetModule(argparse.Action):
     def __call__(self, parser, namespace, value, optstr):
       namespace._current(value)
 
   @classmethod
-  def parse(cls):
+  def parse(cls, argv=None):
     parser = argparse.ArgumentParser(
         prog='dfaccto_tpl',
         description='Build a data model from a config script and use it to render templates')
@@ -62,11 +84,43 @@ class Cmdline:
         action='store_true',
         help='enter debugger after scripts are read and before templates are rendered')
 
+    parser.add_argument('--cachedir', dest=cls.KEY_CACHEDIR,
+        required=False, action='store',
+        type=partial(path_arg, dir=True, exist=False),
+        metavar='<cachedir>',
+        help='place cache files here (default: __tplcache__ and __cfgcache__ directories next to the templates and config scripts)')
+
+    parser.add_argument('--no-cache', dest=cls.KEY_NOCACHE,
+        action='store_true',
+        help='neither read nor write cache files')
+
+    parser.add_argument('--compile', dest=cls.KEY_COMPILE,
+        action='store_true',
+        help='compile templates into Python functions before rendering')
+
+    parser.add_argument('--snapshot', dest=cls.KEY_SNAPSHOT,
+        required=False, action='store',
+        type=partial(path_arg, dir=False, exist=False),
+        metavar='<snapshot>',
+        help='load the model from this file instead of running the config scripts if none of them changed, otherwise update it')
+
+    parser.add_argument('--bufsize', dest=cls.KEY_BUFSIZE,
+        required=False, action='store',
+        type=partial(int_arg, min=1),
+        metavar='<bytes>',
+        help='buffer size for writing generated files (default: {})'.format(DEFAULT_BUFFER_SIZE))
+
+    parser.add_argument('--jobs', '-j', dest=cls.KEY_JOBS,
+        required=False, action='store',
+        type=partial(int_arg, min=0),
+        metavar='<jobs>',
+        help='render templates in this many processes (0: one per CPU, default: 1)')
+
     parser.add_argument('--outdir', '-o', dest=cls.KEY_OUTDIR,
         required=True, action='store',
         type=partial(path_arg, dir=True, exist=False),
         metavar='<outdir>',
-        help='place generated files here (WARNING: deletes existing content!)')
+        help='place generated files here (WARNING: deletes existing content not generated in this run!)')
 
     parser.add_argument('--outlist', '-l', dest=cls.KEY_OUTLIST,
         required=False, action='store',
@@ -74,6 +128,24 @@ class Cmdline:
         metavar='<outlist>',
         help='write a list of generated files to this file')
 
+    parser.add_argument('--changedlist', '-L', dest=cls.KEY_CHANGEDLIST,
+        required=False, action='store',
+        type=partial(path_arg, dir=False, exist=False),
+        metavar='<changedlist>',
+        help='write a list of generated files that were written in this run to this file')
+
+    parser.add_argument('--write-changed', dest=cls.KEY_WRITECHANGED,
+        action='store_true',
+        help='leave generated files untouched if their content did not change')
+
+    parser.add_argument('--incremental', dest=cls.KEY_INCREMENTAL,
+        action='store_true',
+        help='keep a manifest in <outdir> and only render outputs whose templates or elements changed')
+
+    parser.add_argument('--watch', dest=cls.KEY_WATCH,
+        action='store_true',
+        help='keep running and render again when config scripts or templates change, until interrupted')
+
     parser.add_argument('--entry', '-e', dest=cls.KEY_ENTRY,
         required=True, action='store',
         type=partial(str_arg, regex=re.compile('\S+')),
@@ -97,12 +169,13 @@ class Cmdline:
         metavar='<tpldir>',
         help='search for templates and partials here (can appear more than once)')
 
-    return parser.parse_args(namespace=cls())
+    return parser.parse_args(argv, namespace=cls())
 
   def __init__(self):
     self._modules = dict()
     self._globals = argparse.Namespace()
     self._current_key = None # default module
+    self._search_paths = dict() # (key, module) -> SearchPath
 
   def __setattr__(self, key, value):
     if key in type(self).MODULE_KEYS:
@@ -144,6 +217,23 @@ class Cmdline:
   def tpldirs(self, module=None):
     return getattr(self._trymodule(module), type(self).KEY_TPLDIRS, [])
 
+  def _search_path(self, key, module):
+    search_path = self._search_paths.get((key, module))
+    if search_path is None:
+      search_path = SearchPath(getattr(self._trymodule(module), key, []))
+      self._search_paths[(key, module)] = search_path
+    return search_path
+
+  def cfgpath(self, module=None):
+    return self._search_path(type(self).KEY_CFGDIRS, module)
+
+  def tplpath(self, module=None):
+    return self._search_path(type(self).KEY_TPLDIRS, module)
+
+  def refresh_paths(self):
+    for search_path in self._search_paths.values():
+      search_path.refresh()
+
   def entry(self):
     return getattr(self._globals, type(self).KEY_ENTRY)
 
@@ -156,4 +246,37 @@ class Cmdline:
   def debug(self):
     return getattr(self._globals, type(self).KEY_DEBUG, False)
 
+  def cachedir(self):
+    return getattr(self._globals, type(self).KEY_CACHEDIR, None)
+
+  def no_cache(self):
+    return getattr(self._globals, type(self).KEY_NOCACHE, False)
+
+  def compile(self):
+    return getattr(self._globals, type(self).KEY_COMPILE, False)
+
+  def changedlist(self):
+    return getattr(self._globals, type(self).KEY_CHANGEDLIST, None)
+
+  def write_changed(self):
+    return getattr(self._globals, type(self).KEY_WRITECHANGED, False)
+
+  def incremental(self):
+    return getattr(self._globals, type(self).KEY_INCREMENTAL, False)
+
+  def snapshot(self):
+    return getattr(self._globals, type(self).KEY_SNAPSHOT, None)
+
+  def watch(self):
+    return getattr(self._globals, type(self).KEY_WATCH, False)
+
+  def jobs(self):
+    jobs = getattr(self._globals, type(self).KEY_JOBS, None)
+    if jobs is None:
+      return 1
+    return jobs or os.cpu_count() or 1
+
+  def bufsize(self):
+    return getattr(self._globals, type(self).KEY_BUFSIZE, None) or DEFAULT_BUFFER_SIZE
+
 
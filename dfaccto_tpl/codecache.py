@@ -0,0 +1,42 @@
+from importlib.util import MAGIC_NUMBER
+import marshal
+import struct
+
+from .filecache import FileCache
+
+
+
+class CodeCache(FileCache):
+  """
+  Persistent cache of compiled config scripts (see FileCache).
+
+  Each script is associated with a single cache file holding its
+  marshalled code object. The cache file is tagged with the Python
+  bytecode version and the mtime and size of the script.
+  """
+
+  Magic = b'DFCC' + MAGIC_NUMBER
+  CacheDirName = '__cfgcache__'
+  Suffix = 'code'
+  _Stamp = struct.Struct('<QQ')
+
+  def _write(self, f, code):
+    f.write(marshal.dumps(code))
+
+  def _read(self, f):
+    return marshal.loads(f.read())
+
+  def compile_file(self, path):
+    """
+      Return the code object of the script at path, reusing a cached one if valid
+
+      raises OSError if the script can not be read
+      raises SyntaxError and others like compile() for invalid scripts
+    """
+    stat = path.stat()
+    stamp = type(self)._Stamp.pack(stat.st_mtime_ns, stat.st_size)
+    code = self._load(path, stamp)
+    if code is None:
+      code = compile(path.read_text(), path, 'exec')
+      self._store(path, stamp, code)
+    return code
@@ -1,11 +1,11 @@
 from collections import namedtuple
 from pathlib import Path
 import sys
-import traceback
 
+from .codecache import CodeCache
 from .context import Context
 from .frontend import Frontend
-from .util import DFACCTOError, ModuleRef, resolve_path
+from .util import DFACCTOError, ModuleRef
 
 
 ExecEntry = namedtuple('ExecEntry', ['base', 'module'])
@@ -22,12 +22,17 @@ class ConfigReader:
                      'Part': self.partial_ref}
     self._globals.update(self._frontend.namespace)
     self._executed = set()
+    self._code_cache = None if args.no_cache() else CodeCache(args.cachedir())
     self._stack = [ExecEntry(Path('.').resolve(), None)]
 
   @property
   def context(self):
     return self._context
 
+  @property
+  def scripts(self):
+    return sorted(self._executed)
+
   def get_module(self):
     return self._stack[-1].module
 
@@ -50,7 +55,7 @@ class ConfigReader:
         raise DFACCTOError('Can not resolve relative script name "{}"'.format(name))
     else:
       module = self._stack[-1].module if abs is True else abs
-      path = resolve_path(self._args.cfgdirs(module), name)
+      path = self._args.cfgpath(module).resolve(name)
       if path is None:
         raise DFACCTOError('Can not resolve absolute script name "{}" in module {}'.format(name, module))
     return (path.resolve(), module)
@@ -66,12 +71,16 @@ class ConfigReader:
     try:
       code = None
       try:
-        code = compile(path.read_text(), path, 'exec')
+        if self._code_cache is not None:
+          code = self._code_cache.compile_file(path)
+        else:
+          code = compile(path.read_text(), path, 'exec')
       except Exception as e:
         raise DFACCTOError('Error compiling "{}":\n  {}'.format(path, e))
       try:
         exec(code, self._globals)
       except DFACCTOError:
+        import traceback
         e_type,e_msg,e_tb = sys.exc_info()
         e_trace = traceback.extract_tb(e_tb)
         e_frame = e_trace[1] # select frame within user code
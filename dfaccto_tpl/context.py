@@ -12,6 +12,9 @@ class Context(HasProps):
     self._packages = Registry()
     self._entities = Registry()
     self._identifiers = Registry()
+    # unqualified name -> packages defining it, see Package.add_type/add_constant
+    self._type_packages = dict()
+    self._constant_packages = dict()
 
   def __str__(self):
     return '<global>'
@@ -33,6 +36,21 @@ class Context(HasProps):
     self._packages.clear()
     self._entities.clear()
     self._identifiers.clear()
+    self._type_packages.clear()
+    self._constant_packages.clear()
+
+  def freeze(self):
+    """
+      Precompute derived data of all packages and entities
+
+      Must be called once the model is complete, i.e. after all config
+      scripts have been read, and before rendering.
+    """
+    for element in self._identifiers.contents():
+      element.freeze()
+
+  def sorted_packages(self, packages):
+    return sorted(packages, key=lambda pkg: self._packages.index(pkg.name))
 
   def add_package(self, name):
     return Package(self, name)
@@ -52,9 +70,19 @@ class Context(HasProps):
     else:
       raise DFACCTOError('Entity reference "{}" can not be found'.format(name))
 
+  def index_type(self, name, pkg):
+    self._type_packages.setdefault(name, []).append(pkg)
+
+  def index_constant(self, name, pkg):
+    self._constant_packages.setdefault(name, []).append(pkg)
+
   def get_type(self, name, pkg_name=None):
     type = None
     if pkg_name is None:
+      pkgs = self._type_packages.get(name, ())
+      if len(pkgs) == 1:
+        return pkgs[0].types.lookup(name)
+      # scan all packages to report ambiguous references in package order
       for pkg in self._packages.contents():
         if pkg.types.has(name):
           if type is not None:
@@ -71,6 +99,10 @@ class Context(HasProps):
   def get_constant(self, name, pkg_name=None):
     constant = None
     if pkg_name is None:
+      pkgs = self._constant_packages.get(name, ())
+      if len(pkgs) == 1:
+        return pkgs[0].constants.lookup(name)
+      # scan all packages to report ambiguous references in package order
       for pkg in self._packages.contents():
         if pkg.constants.has(name):
           if constant is not None:
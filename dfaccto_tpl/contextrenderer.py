@@ -1,19 +1,104 @@
 from functools import partial
+import os
 from pathlib import Path
 import re
-import shutil
 
-from .template import parse, TemplateError
-from .util import DFACCTOError, ModuleRef, resolve_path
+from .util import DFACCTOError, ModuleRef, file_hash
 
 
 
 class ContextRenderer:
 
-  def __init__(self, args):
+  Rendered = 'rendered'
+  Written = 'written'
+  Unchanged = 'unchanged'
+  Current = 'current'
+
+  def __init__(self, args, scripts=()):
     self._args = args
     self._templates = dict()
+    self._tpl_paths = dict() # tpl_spec -> template file
+    self._partials = dict() # tpl_spec -> specs of partials linked into it
+    self._used = None # specs of partials requested while rendering
+    self._hashes = dict()
+    self._fingerprinter = None # Fingerprinter of this pass, created on first use
+    self._claimed = set()
+    self._outdirs = set() # directories known to exist in this pass
+    self._rendered = list()
+    self._changed = list()
+    self._outdated = None # outputs using one of these tpl_specs are rendered again, None for all
+    self._uses = dict() # outpath -> specs of all templates used to render it
+    self._cache = None # TemplateCache, created when the first template is parsed
+    self._manifest = self._load_manifest(scripts)
+
+  def _load_manifest(self, scripts):
+    if not self._args.incremental():
+      return None
+    from . import __version__
+    # the manifest and the model classes it fingerprints are only imported for incremental runs
+    from .manifest import Manifest
+    manifest = Manifest(self._args.outdir(), __version__)
+    manifest.load()
+    manifest.set_config((str(path), file_hash(path)) for path in scripts)
+    return manifest
+
+  def restart(self, scripts=(), outdated=None, args=None):
+    """
+      Prepare another rendering pass
+
+      Parsed templates are kept unless dropped by invalidate().
+      If outdated is given, only outputs rendered with one of these
+      templates or partials are rendered again, all others are kept.
+      If args is given, the pass uses this command line instead, which
+      must specify the same template directories and template options.
+    """
+    if args is not None:
+      self._args = args
+    self._hashes.clear()
+    self._fingerprinter = None
+    self._claimed.clear()
+    self._outdirs.clear()
     self._rendered = list()
+    self._changed = list()
+    self._outdated = outdated
+    self._manifest = self._load_manifest(scripts)
+
+  def _resolve_template(self, tpl_spec):
+    try:
+      return self._args.tplpath(tpl_spec.module).resolve(tpl_spec.name)
+    except DFACCTOError:
+      return None
+
+  def invalidate(self, paths):
+    """
+      Drop parsed templates affected by changes to the files at paths
+
+      Search paths must be refreshed first (see Cmdline.refresh_paths()),
+      so that template names now resolving to another file are detected.
+      Returns the specs of all dropped templates, i.e. of the changed
+      templates and of all templates linking one of them as a partial.
+    """
+    paths = set(paths)
+    changed = set()
+    for spec in set(self._tpl_paths).union(*self._partials.values()):
+      path = self._tpl_paths.get(spec)
+      if path in paths or self._resolve_template(spec) != path:
+        changed.add(spec)
+    dropped = {spec for spec in self._templates if not changed.isdisjoint(self._used_templates((spec,)))}
+    for spec in dropped:
+      del self._templates[spec]
+      self._tpl_paths.pop(spec, None)
+      self._partials.pop(spec, None)
+    return dropped | changed
+
+  @property
+  def _keeps_outputs(self):
+    return self._manifest is not None and self._manifest.valid
+
+  @property
+  def _reuses_outdir(self):
+    # existing files are kept until all outputs have been rendered
+    return self._keeps_outputs or self._args.write_changed() or self._args.watch()
 
   def _get_template(self, tpl_spec):
     if not isinstance(tpl_spec, ModuleRef):
@@ -21,16 +106,31 @@ class ContextRenderer:
     if tpl_spec in self._templates:
       return self._templates[tpl_spec]
 
-    tpl_path = resolve_path(self._args.tpldirs(tpl_spec.module), tpl_spec.name)
+    tpl_path = self._args.tplpath(tpl_spec.module).resolve(tpl_spec.name)
     if tpl_path is None:
       raise DFACCTOError('Error: Can not find template "{}" in module {}'.format(tpl_spec.name, tpl_spec.module))
     tpl_name = '{}:{}'.format(tpl_spec.module or '', tpl_spec.name)
-    tpl_content = tpl_path.read_text()
+    # the template engine is only imported if templates are rendered
+    from .template import parse, compile_template, TemplateCache, TemplateError
     try:
-      tpl = parse(tpl_content, tpl_name, module=tpl_spec.module)
+      if not self._args.no_cache():
+        if self._cache is None:
+          self._cache = TemplateCache(cache_dir=self._args.cachedir())
+        tpl = self._cache.parse_file(tpl_path, tpl_name, module=tpl_spec.module)
+      else:
+        tpl = parse(tpl_path.read_text(), tpl_name, module=tpl_spec.module)
     except TemplateError as e:
       raise DFACCTOError(str(e))
+    # register before linking, as partials may refer back to this template
     self._templates[tpl_spec] = tpl
+    self._tpl_paths[tpl_spec] = tpl_path
+    outer_used, self._used = self._used, set()
+    try:
+      tpl.link(self._link_partial)
+    finally:
+      self._partials[tpl_spec], self._used = self._used, outer_used
+    if self._args.compile():
+      compile_template(tpl)
 
     return tpl
 
@@ -46,38 +146,238 @@ class ContextRenderer:
         module = None
       name = m.group(2)
       spec = ModuleRef(module, name)
+      if self._used is not None:
+        self._used.add(spec)
       return self._get_template(spec)
     else:
       raise DFACCTOError('Error: Invalid partial identifier "{}"'.format(identifier))
 
+  def _link_partial(self, identifier, template):
+    try:
+      return self._get_partial(identifier, template)
+    except DFACCTOError:
+      return None # report unresolvable partials only when they are rendered
+
   def _get_outpath(self, out_spec):
     if not isinstance(out_spec, ModuleRef):
       raise DFACCTOError('Error: invalid output file specification "{}"'.format(out_spec))
     module_dir = 'mod_{}'.format(out_spec.module) if out_spec.module is not None else 'mod'
     path = self._args.outdir() / module_dir / out_spec.name
-    path.parent.mkdir(parents=True, exist_ok=True)
-    if path.exists():
+    if path.parent not in self._outdirs:
+      path.parent.mkdir(parents=True, exist_ok=True)
+      self._outdirs.add(path.parent)
+    if path in self._claimed or (not self._reuses_outdir and path.exists()):
       raise DFACCTOError('Error: would override existing file "{}"'.format(path))
+    self._claimed.add(path)
     return path
 
+  def _used_templates(self, specs):
+    # all templates reachable from specs through linked partials
+    used = set()
+    pending = list(specs)
+    while pending:
+      spec = pending.pop()
+      if spec not in used:
+        used.add(spec)
+        pending.extend(self._partials.get(spec, ()))
+    return used
+
+  def _spec_hash(self, spec_str):
+    if spec_str not in self._hashes:
+      module, name = spec_str.split(':', 1)
+      path = self._args.tplpath(module or None).resolve(name)
+      self._hashes[spec_str] = file_hash(path) if path is not None else None
+    return self._hashes[spec_str]
+
+  def _is_current(self, job, outpath):
+    # returns (is_current, (output name, element fingerprint))
+    if (self._outdated is not None and outpath in self._uses and
+        self._outdated.isdisjoint(self._uses[outpath]) and outpath.is_file()):
+      if self._manifest is not None:
+        self._manifest.keep(outpath.relative_to(self._args.outdir()).as_posix())
+      return True, None
+    if self._manifest is None:
+      return False, None
+    name = outpath.relative_to(self._args.outdir()).as_posix()
+    if self._fingerprinter is None:
+      from .context import Context
+      from .manifest import Fingerprinter
+      self._fingerprinter = Fingerprinter(boundary=(Context,))
+    element_fp = self._fingerprinter.fingerprint(job[2])
+    if self._manifest.is_current(name, element_fp, self._spec_hash, partial(file_hash, outpath)):
+      self._manifest.keep(name)
+      return True, None
+    return False, (name, element_fp)
+
+  def _record(self, record, used, outpath):
+    if record is not None:
+      templates = {'{}:{}'.format(spec.module or '', spec.name) for spec in used}
+      self._manifest.record(*record, {spec: self._spec_hash(spec) for spec in templates}, file_hash(outpath))
+
   def empty(self):
+    if self._reuses_outdir:
+      return # existing files are kept, stale ones removed by write_rendered()
+    import shutil
     for item in self._args.outdir().iterdir():
       if item.is_dir():
         shutil.rmtree(item)
       else:
         item.unlink()
 
-  def render(self, tpl_spec, out_spec, context):
+  def _replace_output(self, tmppath, outpath):
+    # returns False if outpath is left untouched, as it already has the new content
+    if self._args.write_changed():
+      try:
+        if outpath.stat().st_size == tmppath.stat().st_size and file_hash(outpath) == file_hash(tmppath):
+          return False
+      except OSError:
+        pass
+    tmppath.replace(outpath)
+    return True
+
+  def _render_to(self, tpl_spec, outpath, context):
+    # returns whether outpath was written and the specs of all templates used
     template = self._get_template(tpl_spec)
-    outpath = self._get_outpath(out_spec)
+    from .template import TemplateError
+    # stream into a temporary file and rename it when complete,
+    # so that outpath never holds partially rendered content
+    tmppath = outpath.with_name('.{}.{:d}.tmp'.format(outpath.name, os.getpid()))
+    self._used = set()
     try:
-      outpath.write_text(template.render(context, partial=self._get_partial))
-      self._rendered.append(outpath)
+      with tmppath.open('w', buffering=self._args.bufsize()) as stream:
+        template.render_to(stream, context, partial=self._get_partial)
+      written = self._replace_output(tmppath, outpath)
     except TemplateError as e:
       raise DFACCTOError(str(e))
+    finally:
+      used, self._used = self._used, None
+      if tmppath.exists():
+        tmppath.unlink()
+    used.add(tpl_spec)
+    return written, self._used_templates(used)
+
+  def _status(self, outpath, written, used):
+    self._uses[outpath] = used
+    self._rendered.append(outpath)
+    if written:
+      self._changed.append(outpath)
+    if not self._args.write_changed():
+      return type(self).Rendered
+    return type(self).Written if written else type(self).Unchanged
+
+  def render(self, tpl_spec, out_spec, context):
+    """
+      Render template tpl_spec with context into out_spec and return a status
+
+      Rendered: the output was written
+      Written, Unchanged: with --write-changed, whether the output file
+        was replaced or already had the new content
+      Current: with --incremental, or if not outdated after restart(),
+        the output was not rendered again
+    """
+    outpath = self._get_outpath(out_spec)
+    current, record = self._is_current((tpl_spec, out_spec, context), outpath)
+    if current:
+      self._rendered.append(outpath)
+      return type(self).Current
+    written, used = self._render_to(tpl_spec, outpath, context)
+    self._record(record, used, outpath)
+    return self._status(outpath, written, used)
+
+  def render_jobs(self, jobs, processes=1):
+    """
+      Render a list of (tpl_spec, out_spec, context) jobs
+
+      Yields (job, status) after each job has been rendered or found
+      current, in the order of jobs. See render() for the status values.
+      With processes > 1, all output paths are resolved and the
+      templates of outdated outputs are parsed up front. These outputs
+      are then rendered by forked worker processes, which inherit the
+      data model and the parsed templates.
+      Platforms without fork() render sequentially.
+    """
+    fork = _fork_context() if processes > 1 and len(jobs) > 1 else None
+    if fork is None:
+      for job in jobs:
+        yield job, self.render(*job)
+      return
+
+    global _fork_jobs
+    prepared = list()
+    for job in jobs:
+      tpl_spec, out_spec, context = job
+      outpath = self._get_outpath(out_spec)
+      current, record = self._is_current(job, outpath)
+      if not current:
+        self._get_template(tpl_spec)
+      prepared.append((current, record, (tpl_spec, outpath, context)))
+    outdated = [args for current, record, args in prepared if not current]
+
+    _fork_jobs = (self, outdated)
+    try:
+      with fork.Pool(max(1, min(processes, len(outdated)))) as pool:
+        chunksize = max(1, len(outdated) // (processes * 4))
+        results = pool.imap(_render_forked, range(len(outdated)), chunksize)
+        for job, (current, record, (tpl_spec, outpath, context)) in zip(jobs, prepared):
+          if current:
+            self._rendered.append(outpath)
+            yield job, type(self).Current
+            continue
+          error, result = next(results)
+          if error is not None:
+            raise DFACCTOError(error)
+          written, used = result
+          self._record(record, used, outpath)
+          yield job, self._status(outpath, written, used)
+    finally:
+      _fork_jobs = None
+
+  def _remove_unclaimed(self):
+    # remove files of an earlier run that were not rendered again
+    keep = set(self._claimed)
+    if self._manifest is not None:
+      keep.add(self._manifest.path)
+    for path in sorted(self._args.outdir().rglob('*'), reverse=True):
+      if path.is_dir():
+        if not any(path.iterdir()):
+          path.rmdir()
+      elif path not in keep:
+        path.unlink()
 
   def write_rendered(self):
+    if self._keeps_outputs:
+      for name in self._manifest.stale():
+        stale_path = self._args.outdir() / name
+        if stale_path.is_file():
+          stale_path.unlink()
+    elif self._outdated is None and (self._args.write_changed() or self._args.watch()):
+      # a pass restricted to outdated outputs claims the same files as the one before
+      self._remove_unclaimed()
+    if self._manifest is not None:
+      self._manifest.save()
     self._rendered.append('')
     if self._args.outlist() is not None:
       self._args.outlist().write_text('\n'.join(str(path) for path in self._rendered))
+    self._changed.append('')
+    if self._args.changedlist() is not None:
+      self._args.changedlist().write_text('\n'.join(str(path) for path in self._changed))
+
+
+
+def _fork_context():
+  # multiprocessing is only imported when rendering in parallel
+  import multiprocessing as mp
+  if 'fork' not in mp.get_all_start_methods():
+    return None
+  return mp.get_context('fork')
+
+
+# (renderer, [(template, outpath, context)]) inherited by forked workers
+_fork_jobs = None
 
+def _render_forked(idx):
+  renderer, jobs = _fork_jobs
+  try:
+    return None, renderer._render_to(*jobs[idx])
+  except DFACCTOError as e:
+    return e.msg, None
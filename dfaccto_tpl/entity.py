@@ -2,6 +2,7 @@ from itertools import chain
 
 from .element import Element, PackageElement
 from .generic import Generic
+from .net import Net
 from .port import Port
 from .signal import Signal
 from .util import Registry, IndexWrapper, safe_str, visit_usage_deps
@@ -17,6 +18,8 @@ class Entity(Element):
     self._signals = Registry()
     self._connectables = Registry()
     self._identifiers = Registry()
+    self._dependencies = None
+    self._nets = None # connectable -> Net, see freeze()
 
     self.context.entities.register(self.name, self)
     self.context.identifiers.register(self.identifier, self)
@@ -65,9 +68,27 @@ class Entity(Element):
 
   @property
   def dependencies(self):
+    if self._dependencies is not None:
+      return self._dependencies
     deps = set()
     self.usage_deps(deps, set())
-    return IndexWrapper(deps)
+    return IndexWrapper(self.context.sorted_packages(deps))
+
+  @property
+  def nets(self):
+    if self._nets is not None:
+      return IndexWrapper(list(self._nets.values()))
+    return IndexWrapper([Net(connectable) for connectable in self._connectables.contents()])
+
+  def net_of(self, connectable):
+    if self._nets is not None:
+      return self._nets[connectable]
+    return Net(connectable)
+
+  def freeze(self):
+    self._dependencies = None
+    self._dependencies = self.dependencies
+    self._nets = {connectable: Net(connectable) for connectable in self._connectables.contents()}
 
   def usage_deps(self, deps, visited):
     self.prop_deps(deps, visited)
@@ -0,0 +1,67 @@
+from hashlib import sha256
+
+
+
+class FileCache:
+  """
+  Base of persistent caches with one cache file per source file,
+  analogous to __pycache__.
+
+  A cache file starts with the magic of the cache (by default the Magic
+  of its class) and a key derived
+  from the source file, followed by the payload written by _write().
+  It is only used if both still match, otherwise the caller builds the
+  payload again and replaces the cache file.
+
+  If no cache_dir is given, cache files are placed in a CacheDirName
+  directory next to each source file.
+  Failures to read or write cache files are silently ignored.
+  """
+
+  Magic = b''
+  CacheDirName = None
+  Suffix = None
+
+  def __init__(self, cache_dir=None, magic=None):
+    self._cache_dir = cache_dir
+    self._magic = type(self).Magic if magic is None else magic
+
+  def _write(self, f, payload):
+    raise NotImplementedError()
+
+  def _read(self, f):
+    raise NotImplementedError()
+
+  def _cache_path(self, path):
+    if self._cache_dir is None:
+      return path.parent / type(self).CacheDirName / '{}.{}'.format(path.name, type(self).Suffix)
+    path_hash = sha256(str(path.resolve()).encode()).hexdigest()
+    return self._cache_dir / '{}.{}.{}'.format(path.name, path_hash[:16], type(self).Suffix)
+
+  def _load(self, path, key):
+    """Return the cached payload for the source file at path, or None if it is missing or stale"""
+    try:
+      with self._cache_path(path).open('rb') as f:
+        if f.read(len(self._magic)) != self._magic:
+          return None
+        if f.read(len(key)) != key:
+          return None
+        return self._read(f)
+    except Exception:
+      return None
+
+  def _store(self, path, key, payload):
+    cache_path = self._cache_path(path)
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    try:
+      cache_path.parent.mkdir(parents=True, exist_ok=True)
+      with tmp_path.open('wb') as f:
+        f.write(self._magic)
+        f.write(key)
+        self._write(f, payload)
+      tmp_path.replace(cache_path)
+    except Exception:
+      try:
+        tmp_path.unlink()
+      except OSError:
+        pass
@@ -109,6 +109,7 @@ class Frontend:
       'PortV':     partial(self.port_declaration, Role.View),
       'PortP':     partial(self.port_declaration, Role.Pass),
       'Ins':       self.instance_declaration,
+      'InsArray':  self.instance_array,
       'MapPort':   self.port_assignment,
       'MapGeneric': self.generic_assignment}
 
@@ -339,6 +340,53 @@ class Frontend:
 
     return instance
 
+  def instance_array(self, entity_name, name, expand, *decls, **directives):
+    """
+      Instantiate an entity once for each value in expand
+
+      The instance name is formatted with each value (see reference()).
+      Mapping targets may be callables, which are called with the value
+      to get the target of each instance, e.g.
+        InsArray('Lane', 'lane{}', range(4), MapPort('data', lambda i: S('data{}', expand=i)))
+      Entity, mappings and props are looked up and checked once for all
+      instances. Returns a tuple of the new instances.
+    """
+    if not self.in_entity_context:
+      raise DFACCTOError('Instance declaration must appear in an entity context')
+    entity_name = self.name_value(entity_name)
+    if name is None:
+      name = entity_name[0].lower() + entity_name[1:]
+    props = self.read_props(directives)
+
+    entity = self._context.get_entity(entity_name)
+    # instance generics and ports are created in the order of the entity's
+    mappings = list()
+    for decl in decls:
+      if isinstance(decl, GenericAssignment):
+        registry = 'generics'
+      elif isinstance(decl, PortAssignment):
+        registry = 'ports'
+      else:
+        raise DFACCTOError('Unexpected parameter "{}" in instance declaration'.format(decl))
+      parts = getattr(entity, registry)
+      if not parts.has(decl.name):
+        raise DFACCTOError('Entity {} does not have a {} "{}"'.format(entity, registry[:-1], decl.name))
+      mappings.append((registry, parts.index(decl.name), decl))
+
+    instances = list()
+    for value in expand:
+      inst_name = self._entity.instances.unique_name(self.name_value(name.format(value)))
+      instance = entity.instantiate(self._entity, inst_name)
+      for registry, idx, decl in mappings:
+        part = getattr(instance, registry)[idx]
+        part.assign(decl.to(value) if callable(decl.to) else decl.to)
+        for prop_name, prop_value in decl.props:
+          part.set_prop(prop_name, self._unpack_value(prop_value, instance))
+      for prop_name, prop_value in props:
+        instance.set_prop(prop_name, self._unpack_value(prop_value, instance))
+      instances.append(instance)
+    return tuple(instances)
+
   def generic_assignment(self, name, to, **directives):
     return GenericAssignment(self.name_value(name), to, self.read_props(directives))
 
@@ -2,34 +2,44 @@ from .util import visit_usage_deps
 
 
 class HasProps:
+  # prefixes of dynamic attributes that look up an element in a registry
+  _RegistryPrefixes = (('P_', 'packages'),
+                       ('c_', 'constants'),
+                       ('t_', 'types'),
+                       ('E_', 'entities'),
+                       ('g_', 'generics'),
+                       ('p_', 'ports'),
+                       ('i_', 'instances'))
+
+  @classmethod
+  def _init_dispatch(cls):
+    # precompute the dynamic attribute dispatch of each class (see __getattr__)
+    cls._is_a_names = frozenset(base.__name__.lower() for base in cls.mro())
+    cls._prefix_registries = {prefix: name for prefix, name in cls._RegistryPrefixes
+                                           if hasattr(cls, name)}
+
+  def __init_subclass__(cls, **kwargs):
+    super().__init_subclass__(**kwargs)
+    cls._init_dispatch()
+
   def __init__(self):
-    self._props = dict()
+    self._props = None # allocated on first use, most elements have no props
 
   def __getattr__(self, key):
-    if key.startswith('x_') and key[2:] in self._props:
-      return self._props[key[2:]]
-    elif key.startswith('is_a_'):
-      name = key[5:].lower()
-      return any(name == cls.__name__.lower() for cls in type(self).mro())
-    elif key.startswith('P_') and hasattr(self, 'packages'):
-      return self.packages[key[2:]]
-    elif key.startswith('c_') and hasattr(self, 'constants'):
-      return self.constants[key[2:]]
-    elif key.startswith('t_') and hasattr(self, 'types'):
-      return self.types[key[2:]]
-    elif key.startswith('E_') and hasattr(self, 'entities'):
-      return self.entities[key[2:]]
-    elif key.startswith('g_') and hasattr(self, 'generics'):
-      return self.generics[key[2:]]
-    elif key.startswith('p_') and hasattr(self, 'ports'):
-      return self.ports[key[2:]]
-    elif key.startswith('i_') and hasattr(self, 'instances'):
-      return self.instances[key[2:]]
-    else:
-      raise AttributeError(key)
+    prefix = key[:2]
+    if prefix == 'x_':
+      props = self._props
+      if props is not None and key[2:] in props:
+        return props[key[2:]]
+    elif prefix == 'is' and key.startswith('is_a_'):
+      return key[5:].lower() in self._is_a_names
+    registry = self._prefix_registries.get(prefix)
+    if registry is not None:
+      return getattr(self, registry)[key[2:]]
+    raise AttributeError(key)
 
   def set_prop(self, key, value):
-    self._props[key] = value
+    self.props[key] = value
 
   # -> see Frontend.global_statement()
   # def update_prop(self, key, value):
@@ -47,14 +57,17 @@ class HasProps:
   #   self._props[key] = value
 
   def clear_props(self):
-    self._props.clear()
+    self._props = None
 
   @property
   def props(self):
+    if self._props is None:
+      self._props = dict()
     return self._props
 
   def prop_deps(self, deps, visited):
-    for value in self._props.values():
-      visit_usage_deps(deps, visited, value)
-
+    if self._props is not None:
+      for value in self._props.values():
+        visit_usage_deps(deps, visited, value)
 
+HasProps._init_dispatch()
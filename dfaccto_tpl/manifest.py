@@ -0,0 +1,272 @@
+from enum import Enum
+import gc
+from hashlib import sha256
+import json
+from pathlib import PurePath
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+
+from .element import Element
+from .util import DeferredValue, Registry, object_state
+
+
+
+_Opaque = (type, FunctionType, MethodType, BuiltinFunctionType, ModuleType)
+_Scalars = (bool, int, float, str, bytes, Enum, PurePath)
+_Plain = frozenset((type(None), bool, int, float, str, bytes)) # encoded by repr() alone
+
+
+class Fingerprinter:
+  """
+  Deterministic digests of model elements for one rendering pass.
+
+  The fingerprint of an element covers its own declarations, i.e. its
+  private (underscore) attributes and the elements in its registries
+  (e.g. the ports, generics and instances of an entity) in turn.
+  All other elements it refers to are its dependencies, like the type
+  of a port or the base entity of an instance. They are encoded by
+  their identity (owner, class and name), and the fingerprint adds
+  their own attributes, with their registries reduced to the identities
+  of the members. Dependencies are followed transitively, as a template
+  may reach any of them through a chain of references.
+  Public attributes in an instance __dict__ are skipped, as they only
+  hold derived values (see cached_property), and so are the
+  back-references from assigned values to their containers
+  (see Assignable), as they do not belong to the declaration of the
+  assigned value. The nets and dependencies of entities and packages
+  are skipped as well, as freeze() derives them from the declarations
+  that are already covered. Objects of a boundary type are not followed, only
+  their props are included.
+  Digests are memoized, so the model must not change while a
+  Fingerprinter is in use.
+  """
+
+  SkipAttrs = frozenset(('_assignments', '_nets', '_dependencies'))
+
+  def __init__(self, boundary=()):
+    self._boundary = boundary
+    self._digests = dict() # (id(obj), deep) -> (obj, digest, deps)
+    self._identities = dict() # id(element) -> (element, identity)
+    self._atoms = dict() # id(obj) -> (obj, encoding) of shared objects without dependencies
+
+  def fingerprint(self, root):
+    # the memoized digests stay alive, so garbage collection passes
+    # while creating their many containers would be wasted
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+      return self._fingerprint(root)
+    finally:
+      if gc_enabled:
+        gc.enable()
+
+  def _fingerprint(self, root):
+    digest, deps = self._digest(root, True)
+    # follow dependencies transitively, as templates can reach any
+    # element through a chain of references (e.g. port.type.x_tsize)
+    visited = {id(root)}
+    pending = list(deps.values())
+    entries = list()
+    while pending:
+      dep = pending.pop()
+      if id(dep) in visited:
+        continue
+      visited.add(id(dep))
+      dep_digest, dep_deps = self._digest(dep, False)
+      entries.append((self._identity(dep), dep_digest))
+      pending.extend(element for key, element in dep_deps.items() if key not in visited)
+    hash = sha256(digest)
+    for identity, dep_digest in sorted(entries):
+      hash.update(identity.encode())
+      hash.update(dep_digest)
+    return hash.hexdigest()
+
+  def _identity(self, element):
+    entry = self._identities.get(id(element))
+    if entry is None:
+      state = vars(element)
+      owner = next((state[key] for key in ('_entity', '_package', '_parent') if state.get(key) is not None), None)
+      prefix = '' if owner is None else self._identity(owner) + '/'
+      identity = '<{}{}:{}>'.format(prefix, type(element).__name__, state.get('_name'))
+      entry = self._identities[id(element)] = (element, identity)
+    return entry[1]
+
+  def _digest(self, obj, deep):
+    # returns (digest, dependencies) of an element or another object,
+    # deep digests of elements include their registry members
+    key = (id(obj), deep)
+    entry = self._digests.get(key)
+    if entry is not None:
+      return entry[1], entry[2]
+    self._digests[key] = (obj, b'cycle', {}) # placeholder while obj is encoded
+    parts = [type(obj).__qualname__]
+    deps = dict() # id -> element
+    has_registry = False
+    if isinstance(obj, self._boundary):
+      self._encode(obj.props, parts, deps)
+    else:
+      skip = type(self).SkipAttrs
+      for name, value in object_state(obj).items():
+        if name[0] != '_' or name in skip:
+          continue
+        parts.append(name)
+        # plain values and references are inlined, as most attributes are
+        if type(value) in _Plain:
+          parts.append(repr(value))
+        elif isinstance(value, Element):
+          deps[id(value)] = value
+          parts.append(self._identity(value))
+        elif id(value) in self._atoms:
+          parts.append(self._atoms[id(value)][1])
+        elif type(value) is Registry:
+          has_registry = True
+          if deep:
+            self._encode_members(value, parts, deps)
+          else:
+            self._encode(value, parts, deps)
+        else:
+          self._encode(value, parts, deps)
+    entry = (obj, sha256(';'.join(parts).encode()).digest(), deps)
+    self._digests[key] = entry
+    if not has_registry: # deep and shallow digest are the same
+      self._digests[(id(obj), not deep)] = entry
+    return entry[1], entry[2]
+
+  def _encode_members(self, registry, parts, deps):
+    parts.append('Registry[{:d}]'.format(len(registry)))
+    for name, member in registry.items():
+      parts.append(name)
+      if isinstance(member, Element):
+        digest, member_deps = self._digest(member, True)
+        parts.append(digest.hex())
+        deps.update(member_deps)
+      else:
+        self._encode(member, parts, deps)
+
+  def _encode(self, obj, parts, deps):
+    if type(obj) in _Plain:
+      parts.append(repr(obj))
+    elif isinstance(obj, Element):
+      deps[id(obj)] = obj
+      parts.append(self._identity(obj))
+    elif isinstance(obj, DeferredValue):
+      parts.append('?')
+    elif isinstance(obj, Enum):
+      parts.append(self._atom(obj, '{}:{!r}'.format(type(obj).__name__, obj)))
+    elif isinstance(obj, _Scalars):
+      parts.append('{}:{!r}'.format(type(obj).__name__, obj))
+    elif isinstance(obj, (list, tuple)):
+      parts.append('{}[{:d}]'.format(type(obj).__name__, len(obj)))
+      for item in obj:
+        self._encode(item, parts, deps)
+    elif isinstance(obj, dict):
+      parts.append('{}{{{:d}}}'.format(type(obj).__name__, len(obj)))
+      for key, value in obj.items():
+        self._encode(key, parts, deps)
+        self._encode(value, parts, deps)
+    elif isinstance(obj, Registry):
+      parts.append('Registry[{:d}]'.format(len(obj)))
+      for name, member in obj.items():
+        parts.append(name)
+        self._encode(member, parts, deps)
+    elif isinstance(obj, (set, frozenset)):
+      items = list()
+      for item in obj:
+        item_parts = list()
+        self._encode(item, item_parts, deps)
+        items.append(';'.join(item_parts))
+      parts.append('{}{{{:d}}}'.format(type(obj).__name__, len(items)))
+      parts.extend(sorted(items))
+    elif isinstance(obj, _Opaque):
+      parts.append(self._atom(obj, '{}:{}'.format(type(obj).__name__, getattr(obj, '__qualname__', ''))))
+    else:
+      digest, obj_deps = self._digest(obj, False)
+      if obj_deps or digest == b'cycle': # only settled digests are shared
+        parts.append(digest.hex())
+        deps.update(obj_deps)
+      else:
+        parts.append(self._atom(obj, digest.hex()))
+
+  def _atom(self, obj, encoding):
+    self._atoms[id(obj)] = (obj, encoding)
+    return encoding
+
+
+class Manifest:
+  """
+  Record of the outputs in an output directory and the inputs they were
+  rendered from, i.e. the content hashes of all templates and partials
+  used and a fingerprint of the rendered element (see Fingerprinter).
+
+  An output is current if all recorded inputs are unchanged and the
+  output file still has the content hash recorded when it was written.
+  """
+
+  FileName = '.dfaccto_manifest.json'
+  Version = 2
+
+  def __init__(self, outdir, tool_version):
+    self._path = outdir / type(self).FileName
+    self._tool_version = tool_version
+    self._old = dict()
+    self._new = dict()
+    self._config = dict()
+    self._valid = False
+
+  @property
+  def path(self):
+    return self._path
+
+  @property
+  def valid(self):
+    """True if a manifest of a compatible earlier run was loaded"""
+    return self._valid
+
+  def load(self):
+    try:
+      data = json.loads(self._path.read_text())
+      if data.get('version') != type(self).Version or data.get('tool') != self._tool_version:
+        return False
+      self._old = data['outputs']
+    except (OSError, ValueError, KeyError, AttributeError):
+      return False
+    self._valid = True
+    return True
+
+  def set_config(self, scripts):
+    self._config = dict(scripts)
+
+  def is_current(self, name, element_fp, template_hash, output_hash):
+    """
+      Check if output name was last rendered from the same inputs and is unmodified
+
+      template_hash(spec_str) must return the current hash of a template,
+      output_hash() the current hash of the output file or None if it is missing.
+    """
+    entry = self._old.get(name)
+    if entry is None or entry.get('element') != element_fp:
+      return False
+    if not all(template_hash(spec) == hash for spec, hash in entry.get('templates', {}).items()):
+      return False
+    return entry.get('output') is not None and entry.get('output') == output_hash()
+
+  def keep(self, name):
+    if name in self._old:
+      self._new[name] = self._old[name]
+
+  def record(self, name, element_fp, templates, output_hash):
+    self._new[name] = {'element': element_fp,
+                       'templates': dict(sorted(templates.items())),
+                       'output': output_hash}
+
+  def stale(self):
+    """Outputs of the earlier run which were not produced in this run"""
+    return [name for name in self._old if name not in self._new]
+
+  def save(self):
+    data = {'version': type(self).Version,
+            'tool': self._tool_version,
+            'config': self._config,
+            'outputs': self._new}
+    tmp_path = self._path.with_name(self._path.name + '.tmp')
+    tmp_path.write_text(json.dumps(data, indent=1))
+    tmp_path.replace(self._path)
@@ -0,0 +1,104 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from .util import IndexWrapper
+
+
+Endpoint = namedtuple('Endpoint', ('element', 'idx'))
+
+
+@lru_cache(maxsize=None)
+def _role_mode(role, mode_attr):
+  return getattr(role, mode_attr)
+
+def _drives(endpoint, mode):
+  # instance ports drive a net with their outputs,
+  # entity ports with their inputs, as seen from inside the entity
+  if endpoint.element.is_instance:
+    return mode == 'out'
+  return mode == 'in'
+
+def _reads(endpoint, mode):
+  if endpoint.element.is_instance:
+    return mode == 'in'
+  return mode == 'out'
+
+
+class Net:
+  """
+  Connectivity of a signal or port within its entity
+
+  The endpoints of a net are the instance ports assigned to the
+  connectable, and the connectable itself if it is a port of the entity.
+  Each endpoint is an (element, idx) pair, where idx is the position of
+  the connectable in a list assignment, or None.
+  Drivers and sinks are classified by the endpoint roles. For complex
+  nets, drivers and sinks refer to the master-to-slave direction and
+  drivers_sm and sinks_sm to the opposite direction.
+  Endpoints with roles that are not specific enough are neither.
+  """
+
+  def __init__(self, connectable):
+    self._connectable = connectable
+    endpoints = list()
+    if not connectable.is_signal:
+      endpoints.append(Endpoint(connectable, None))
+    endpoints.extend(Endpoint(container, idx) for container, idx in connectable.assigned_containers)
+    self._endpoints = endpoints
+    if connectable.knows_complex and connectable.is_complex:
+      self._drivers = self._select(_drives, 'mode_ms')
+      self._sinks = self._select(_reads, 'mode_ms')
+      self._drivers_sm = self._select(_drives, 'mode_sm')
+      self._sinks_sm = self._select(_reads, 'mode_sm')
+    else:
+      self._drivers = self._select(_drives, 'mode')
+      self._sinks = self._select(_reads, 'mode')
+      self._drivers_sm = []
+      self._sinks_sm = []
+
+  def _select(self, predicate, mode_attr):
+    return [endpoint for endpoint in self._endpoints
+                     if predicate(endpoint, _role_mode(endpoint.element.role, mode_attr))]
+
+  def __str__(self):
+    return 'net:{}'.format(self._connectable)
+
+  @property
+  def connectable(self):
+    return self._connectable
+
+  @property
+  def name(self):
+    return self._connectable.name
+
+  @property
+  def endpoints(self):
+    return IndexWrapper(self._endpoints)
+
+  @property
+  def drivers(self):
+    return IndexWrapper(self._drivers)
+
+  @property
+  def sinks(self):
+    return IndexWrapper(self._sinks)
+
+  @property
+  def drivers_sm(self):
+    return IndexWrapper(self._drivers_sm)
+
+  @property
+  def sinks_sm(self):
+    return IndexWrapper(self._sinks_sm)
+
+  @property
+  def fanout(self):
+    return len(self._sinks)
+
+  @property
+  def is_driven(self):
+    return len(self._drivers) > 0
+
+  @property
+  def is_multidriven(self):
+    return len(self._drivers) > 1
@@ -14,6 +14,7 @@ class Package(Element):
     self._constants = Registry()
     self._declarations = Registry()
     self._identifiers = Registry()
+    self._dependencies = None
 
     self.context.packages.register(self.name, self)
     self.context.identifiers.register(self.identifier, self)
@@ -46,10 +47,16 @@ class Package(Element):
 
   @property
   def dependencies(self):
+    if self._dependencies is not None:
+      return self._dependencies
     deps = set()
     self.usage_deps(deps, set())
     deps.discard(self)
-    return IndexWrapper(deps)
+    return IndexWrapper(self.context.sorted_packages(deps))
+
+  def freeze(self):
+    self._dependencies = None
+    self._dependencies = self.dependencies
 
   def usage_deps(self, deps, visited):
     self.prop_deps(deps, visited)
@@ -58,10 +65,14 @@ class Package(Element):
     deps.add(self)
 
   def add_type(self, name, is_complex):
-    return Type(self, name, is_complex)
+    type = Type(self, name, is_complex)
+    self.context.index_type(name, self)
+    return type
 
   def add_constant(self, name, type, size, value):
-    return Constant(self, name, type, size, value)
+    constant = Constant(self, name, type, size, value)
+    self.context.index_constant(name, self)
+    return constant
 
   def get_type(self, name, pkg_name=None):
     if pkg_name is None and self.types.has(name):
@@ -39,6 +39,10 @@ class Port(EntityElement, TypedWithDefault, Assignable):
     except:
       return safe_str(self)
 
+  @property
+  def net(self):
+    return self.entity.net_of(self)
+
   def usage_deps(self, deps, visited):
     EntityElement.usage_deps(self, deps, visited)
     TypedWithDefault.usage_deps(self, deps, visited)
@@ -38,7 +38,10 @@ class Role(IntFlag):
       raise DFACCTOError('"{}" is not a role identifier'.format(string))
 
   def equals(self, other):
-    return (self & other != 0) and (self & ~other == 0)
+    # plain int arithmetic, as IntFlag operators create new members
+    value = self._value_
+    other = int(other)
+    return (value & other) != 0 and (value & ~other) == 0
 
   def refine(self, other):
     new = self & other
@@ -0,0 +1,181 @@
+import argparse
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from itertools import chain
+import json
+import os
+from pathlib import Path
+import signal
+import socket
+import socketserver
+import sys
+import traceback
+
+from .contextrenderer import ContextRenderer
+from .util import DFACCTOError
+from .watch import Watcher, affects_config
+
+
+
+class RenderCache:
+  """
+  Models and parsed templates kept by the render server between requests.
+
+  Models are kept per entry script and config directories, renderers
+  with their parsed templates per template directories and template
+  options. Before one is reused, its directories are scanned for changes
+  as in watch mode: the model is built again if its config scripts
+  changed, and changed templates are parsed again.
+  Config scripts run in the server process and see its environment,
+  not the one of the client.
+  """
+
+  def __init__(self):
+    self._models = dict() # key -> (context, scripts, watcher)
+    self._renderers = dict() # key -> (renderer, watcher)
+
+  @staticmethod
+  def _dirs(args, dirs):
+    return tuple(sorted((module or '', tuple(dirs(module))) for module in args.modules()))
+
+  def model(self, args, build):
+    """Return (context, scripts) of a cached model, or build() a new one"""
+    key = (args.entry(), self._dirs(args, args.cfgdirs))
+    cfgdirs = [cfgdir for module, dirs in key[1] for cfgdir in dirs]
+    if key in self._models:
+      context, scripts, watcher = self._models.pop(key)
+      if not affects_config(watcher.poll(), scripts, cfgdirs):
+        self._models[key] = (context, scripts, watcher)
+        return context, scripts
+    # scan before building, so that changes during the build are noticed
+    watcher = Watcher(cfgdirs, exclude=(args.outdir(),))
+    context, scripts = build()
+    watcher.add_files(scripts)
+    self._models[key] = (context, scripts, watcher)
+    return context, scripts
+
+  def renderer(self, args, scripts):
+    """Return a ContextRenderer for args, reusing the templates parsed for earlier requests"""
+    key = (self._dirs(args, args.tpldirs), args.compile(), args.no_cache(), args.cachedir())
+    if key in self._renderers:
+      renderer, watcher = self._renderers[key]
+      renderer.restart(scripts, args=args)
+      renderer.invalidate(chain(*watcher.poll()))
+      return renderer
+    tpldirs = [tpldir for module, dirs in key[0] for tpldir in dirs]
+    watcher = Watcher(tpldirs, exclude=(args.outdir(),))
+    renderer = ContextRenderer(args, scripts)
+    self._renderers[key] = (renderer, watcher)
+    return renderer
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+  def handle(self):
+    try:
+      request = json.loads(self.rfile.read().decode())
+      argv = [str(arg) for arg in request['argv']]
+      cwd = str(request['cwd'])
+    except (ValueError, KeyError, TypeError) as e:
+      reply = {'status': 2, 'stdout': '', 'stderr': 'Invalid request: {}\n'.format(e)}
+    else:
+      reply = self.server.run(argv, cwd)
+    self.wfile.write(json.dumps(reply).encode())
+
+
+class RenderServer(socketserver.UnixStreamServer):
+  """
+  Render server listening on a Unix domain socket.
+
+  A request is a JSON object with the command line arguments "argv" and
+  the working directory "cwd" of a client. It is run like a command line
+  with main(argv, cache) and answered with a JSON object holding the
+  exit "status" and the "stdout" and "stderr" output.
+  Requests are handled one after another, sharing a RenderCache: each
+  one changes the working directory and redirects stdout and stderr of
+  the server process while it runs. Concurrent clients, e.g. of a
+  parallel make, wait for the requests before them, so a server only
+  saves their startup and model building time, it does not render for
+  several clients at once. Run one server per parallel job for that.
+  The socket is only accessible to the user running the server.
+  """
+
+  def __init__(self, path, main):
+    self._main = main
+    self._cache = RenderCache()
+    socketserver.UnixStreamServer.__init__(self, str(path), _RequestHandler, bind_and_activate=False)
+    try:
+      self.server_bind()
+      # requests run config scripts, so only the owner may connect
+      os.chmod(path, 0o600)
+      self.server_activate()
+    except:
+      self.server_close()
+      raise
+
+  def run(self, argv, cwd):
+    stdout = StringIO()
+    stderr = StringIO()
+    old_cwd = os.getcwd()
+    try:
+      os.chdir(cwd)
+    except OSError as e:
+      return {'status': 2, 'stdout': '', 'stderr': 'Invalid working directory: {}\n'.format(e)}
+    try:
+      with redirect_stdout(stdout), redirect_stderr(stderr):
+        try:
+          status = self._main(argv, self._cache)
+        except SystemExit as e: # raised by argparse for invalid arguments and --help
+          status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+          print('Unexpected error:', file=sys.stderr)
+          traceback.print_exc(file=sys.stderr)
+          status = 1
+    finally:
+      os.chdir(old_cwd)
+    return {'status': status, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+def serve(path, main):
+  """Handle requests on the Unix domain socket at path until terminated"""
+  path = Path(path)
+  if path.exists():
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+      try:
+        sock.connect(str(path))
+      except ConnectionRefusedError: # left over from a server that is no longer running
+        path.unlink()
+      else:
+        raise DFACCTOError('Error: a server is already listening on "{}"'.format(path))
+  with RenderServer(path, main) as server:
+    try:
+      server.serve_forever()
+    finally:
+      path.unlink()
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+      prog='dfaccto_tpl.server',
+      description='Keep models and parsed templates in memory and render on request of dfaccto_tpl.client',
+      epilog='Requests are handled one at a time, concurrent clients wait for their turn.')
+  parser.add_argument('socket',
+      type=lambda arg: Path(arg).expanduser().resolve(),
+      metavar='<socket>',
+      help='listen on this Unix domain socket')
+  args = parser.parse_args(argv)
+
+  from .__main__ import main as render_main
+  # terminate like on an interrupt, so that the socket is removed
+  signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+  try:
+    serve(args.socket, render_main)
+  except DFACCTOError as e:
+    print(e, file=sys.stderr)
+    return 1
+  except KeyboardInterrupt:
+    pass
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,165 @@
+from enum import Enum
+import gc
+import pickle
+import sys
+
+from .util import file_hash, object_state
+
+
+
+def _is_node_type(cls):
+  # model objects are pickled one by one, see ModelSnapshot
+  return (cls.__module__.startswith('dfaccto_tpl.') and
+          not issubclass(cls, (Enum, tuple, type)))
+
+def _collect_nodes(root):
+  """
+    Return all model objects reachable from root and their states
+
+    Iterative, as the model graph is too deep for recursive traversal.
+  """
+  nodes = list()
+  states = list()
+  node_types = dict() # type -> True if it is a node type
+  seen = set()
+  pending = [root]
+  while pending:
+    obj = pending.pop()
+    if obj is None or isinstance(obj, (str, int, float, bytes)) or id(obj) in seen:
+      continue
+    seen.add(id(obj))
+    cls = type(obj)
+    if cls not in node_types:
+      node_types[cls] = _is_node_type(cls)
+    if node_types[cls]:
+      state = object_state(obj)
+      nodes.append(obj)
+      states.append(state)
+      pending.extend(state.values())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+      pending.extend(obj)
+    elif isinstance(obj, dict):
+      pending.extend(obj.keys())
+      pending.extend(obj.values())
+    elif hasattr(obj, '__self__') and not isinstance(obj, type):
+      pending.append(obj.__self__) # bound methods, e.g. DeferredValue callbacks
+  return nodes, states
+
+
+def _node(idx):
+  # placeholder for references to model objects, see _NodeUnpickler.find_class()
+  raise pickle.UnpicklingError('Model object reference outside of a snapshot')
+
+
+class _NodeUnpickler(pickle.Unpickler):
+  def __init__(self, file, nodes):
+    pickle.Unpickler.__init__(self, file)
+    self._nodes = nodes
+
+  def find_class(self, module, name):
+    if module == __name__ and name == _node.__name__:
+      return self._nodes.__getitem__
+    return pickle.Unpickler.find_class(self, module, name)
+
+
+class ModelSnapshot:
+  """
+  Snapshot file of a frozen model, to skip executing the config scripts.
+
+  The snapshot is only used if the entry script, the config directories
+  of all modules and the content of all config scripts executed to build
+  it are unchanged. Other inputs of config scripts, e.g. environment
+  variables or files they read themselves, are not tracked.
+
+  Model objects reference each other in long chains, so they are not
+  pickled recursively. Instead, the states of all model objects are
+  pickled as a flat list, with references to other model objects
+  replaced by their index.
+  Failures to read or write the snapshot are silently ignored.
+  """
+
+  Magic = b'DFSNAP1\n'
+
+  def __init__(self, path, args):
+    from . import __version__
+    self._path = path
+    self._key = (__version__,
+                 sys.version_info[:2],
+                 args.entry(),
+                 sorted((module or '', [str(d) for d in args.cfgdirs(module)])
+                        for module in args.modules()))
+
+  @property
+  def path(self):
+    return self._path
+
+  def load(self):
+    """Return (context, scripts) of a valid snapshot or None"""
+    # the snapshot only holds live objects, so garbage collection
+    # passes while loading its many containers would be wasted
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+      return self._load()
+    finally:
+      if gc_enabled:
+        gc.enable()
+
+  def _load(self):
+    try:
+      with self._path.open('rb') as f:
+        if f.read(len(type(self).Magic)) != type(self).Magic:
+          return None
+        key, scripts = pickle.load(f)
+        if key != self._key or any(file_hash(path) != hash for path, hash in scripts):
+          return None
+        classes, class_idx = pickle.load(f)
+        nodes = [classes[idx].__new__(classes[idx]) for idx in class_idx]
+        states = _NodeUnpickler(f, nodes).load()
+    except Exception:
+      return None
+    for node, state in zip(nodes, states):
+      for key, value in state.items():
+        object.__setattr__(node, key, value)
+    return nodes[0], [path for path, hash in scripts]
+
+  def store(self, context, scripts):
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+      self._store(context, scripts)
+    finally:
+      if gc_enabled:
+        gc.enable()
+
+  def _store(self, context, scripts):
+    nodes, states = _collect_nodes(context)
+    node_ids = {id(node): idx for idx, node in enumerate(nodes)}
+    def reduce_node(node):
+      return _node, (node_ids[id(node)],)
+    classes = list()
+    class_ids = dict()
+    class_idx = list()
+    for node in nodes:
+      cls = type(node)
+      if cls not in class_ids:
+        class_ids[cls] = len(classes)
+        classes.append(cls)
+      class_idx.append(class_ids[cls])
+    tmp_path = self._path.with_name(self._path.name + '.tmp')
+    try:
+      with tmp_path.open('wb') as f:
+        f.write(type(self).Magic)
+        pickle.dump((self._key, [(path, file_hash(path)) for path in scripts]),
+                    f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump((classes, class_idx), f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+        # model objects within the states are pickled as references
+        pickler.dispatch_table = {cls: reduce_node for cls in classes}
+        pickler.dump(states)
+      tmp_path.replace(self._path)
+    except Exception:
+      try:
+        tmp_path.unlink()
+      except OSError:
+        pass
@@ -3,6 +3,9 @@ from .rendering import Template, LiteralToken, ValueToken, IndirectToken, Partia
 from .key import Key
 from .context import Context
 from .errors import TemplateError, ParserError, AbsentError
+from .cache import TemplateCache
+from .compiler import Compiler, compile_template
+from .memo import Memo, MemoInfo
 
 
 
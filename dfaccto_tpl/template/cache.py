@@ -0,0 +1,78 @@
+from functools import lru_cache
+from hashlib import sha256
+from pathlib import Path
+import pickle
+
+from ..filecache import FileCache
+from .parser import Parser
+
+
+
+class TemplateCache(FileCache):
+  """
+  Persistent cache of parsed templates (see FileCache).
+
+  Each template file is associated with a single cache file holding the
+  pickled Template (i.e. the token tree built by Parser.parse()).
+  The cache file is tagged with a fingerprint of the template content,
+  the parser delimiters and the template name and props.
+  Its magic includes a digest of the sources of the template package,
+  so that cache files pickled with other token classes are not used.
+  """
+
+  Magic = b'DFTPL-TC\n'
+  CacheDirName = '__tplcache__'
+  Suffix = 'pickle'
+
+  def __init__(self, parser=None, cache_dir=None):
+    FileCache.__init__(self, cache_dir, type(self).Magic + _source_digest())
+    self._parser = parser or Parser()
+
+  @property
+  def parser(self):
+    return self._parser
+
+  def _fingerprint(self, content, name, props):
+    hash = sha256()
+    hash.update(repr(name).encode())
+    hash.update(b'\0')
+    for delim in self._parser.delimiters:
+      hash.update(delim.encode())
+      hash.update(b'\0')
+    hash.update(repr(sorted(props.items())).encode())
+    hash.update(b'\0')
+    hash.update(content.encode())
+    return hash.digest()
+
+  def _write(self, f, template):
+    pickle.dump(template, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+  def _read(self, f):
+    return pickle.load(f)
+
+  def parse_file(self, path, name=None, **props):
+    """
+      Parse the template file at path, reusing a cached token tree if valid
+
+      raises OSError if the template file can not be read
+      raises ParserError for invalid templates (see Parser.parse())
+    """
+    path = Path(path)
+    content = path.read_text()
+    fingerprint = self._fingerprint(content, name, props)
+    template = self._load(path, fingerprint)
+    if template is None:
+      template = self._parser.parse(content, name, **props)
+      self._store(path, fingerprint, template)
+    return template
+
+
+@lru_cache(maxsize=None)
+def _source_digest():
+  # digest of the modules defining the pickled tokens and the parser building them
+  hash = sha256()
+  for path in sorted(Path(__file__).parent.glob('*.py')):
+    hash.update(path.name.encode())
+    hash.update(b'\0')
+    hash.update(path.read_bytes())
+  return hash.digest()[:16]
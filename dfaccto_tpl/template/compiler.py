@@ -0,0 +1,244 @@
+from .errors import AbsentError
+from .rendering import LiteralToken, ValueToken, PartialToken, SectionToken
+
+
+
+def _as_iterable(value):
+  # coerce a section value like Context.get_iterable()
+  if not value:
+    return []
+  elif isinstance(value, str):
+    return [value]
+  try:
+    iter(value)
+  except TypeError:
+    return [value]
+  return value
+
+
+class _Emitter:
+
+  def __init__(self):
+    self._lines = list()
+    self._consts = dict()
+    self._names = dict()
+    self._depth = 1
+
+  def line(self, fmt, *args):
+    self._lines.append('  ' * self._depth + fmt.format(*args))
+
+  def indent(self):
+    self._depth += 1
+
+  def dedent(self):
+    self._depth -= 1
+
+  def const(self, obj):
+    # keep one namespace entry per distinct object
+    name = self._names.get(id(obj))
+    if name is None:
+      name = '_k{:d}'.format(len(self._consts))
+      self._names[id(obj)] = name
+      self._consts[name] = obj
+    return name
+
+  def source(self, name):
+    return '\n'.join(['def {}(context, buf):'.format(name),
+                      '  access = context.direct_access()',
+                      '  if access is None:',
+                      '    return interpret(context, buf)',
+                      '  stack, stringify, escape, raise_on_absent = access',
+                      '  push = stack.append',
+                      '  pop = stack.pop',
+                      '  write = buf.write',
+                      '  push_indent = buf.push_indent',
+                      '  pop_indent = buf.pop_indent'] + self._lines + ['  return'])
+
+  @property
+  def consts(self):
+    return self._consts
+
+
+class Compiler:
+  """
+  Translate a parsed Template into a generated Python render function.
+
+  The generated function is equivalent to walking the token list with
+  Template.render_with(), but literals are inlined and section modes are
+  specialized at compile time. Keys are resolved by calling their
+  accessors (see Key.accessor) on the context stack, and values are
+  stringified and escaped inline, instead of going through the Context
+  methods for each token. Contexts with a custom lookup function are
+  rendered by the interpreter (see Context.direct_access()).
+  Linked partials (see Template.link()) are called directly, while
+  IndirectTokens and unlinked partials are still dispatched dynamically,
+  as their templates are only known while rendering.
+  Templates should therefore be linked before they are compiled.
+
+  Templates with more nested sections than Python can compile
+  are left to the interpreter.
+  """
+
+  FuncName = '_render'
+
+  def compile(self, template):
+    """
+      Attach a generated render function to template and return it
+
+      Returns template unchanged if code generation fails.
+    """
+    emitter = _Emitter()
+    self._emit_content(emitter, template.content, 0)
+    namespace = dict(emitter.consts)
+    namespace.update(AbsentError=AbsentError,
+                     as_iterable=_as_iterable,
+                     interpret=template.interpret)
+    try:
+      code = compile(emitter.source(type(self).FuncName),
+                     '<compiled {}>'.format(template.name), 'exec')
+      exec(code, namespace)
+    except (SyntaxError, RecursionError, MemoryError):
+      return template
+    template.set_render_func(namespace[type(self).FuncName])
+    return template
+
+  def _emit_content(self, emitter, content, level):
+    emitted = False
+    for token in content or ():
+      if isinstance(token, LiteralToken):
+        emitter.line('write({!r})', token.string)
+        emitted = True
+      elif isinstance(token, ValueToken):
+        self._emit_value(emitter, token)
+        emitted = True
+      elif isinstance(token, PartialToken):
+        self._emit_partial(emitter, token, level)
+        emitted = True
+      elif isinstance(token, SectionToken):
+        self._emit_section(emitter, token, level)
+        emitted = True
+      else: # IndirectToken or unknown tokens keep their own render_with()
+        emitter.line('{}.render_with(context, buf)', emitter.const(token))
+        emitted = True
+    if not emitted:
+      emitter.line('pass')
+
+  def _emit_lookup(self, emitter, key, target, default, emit_found=None):
+    # target = value of key, or default if absent and absent keys are not fatal
+    emitter.line('try:')
+    emitter.indent()
+    emitter.line('{} = {}(stack)', target, emitter.const(key.accessor))
+    emitter.dedent()
+    emitter.line('except AbsentError as e:')
+    emitter.indent()
+    emitter.line('if raise_on_absent:')
+    emitter.indent()
+    emitter.line('e.set_key({})', emitter.const(key))
+    emitter.line('raise')
+    emitter.dedent()
+    emitter.line('{} = {}', target, default)
+    emitter.dedent()
+    if emit_found is not None:
+      emitter.line('else:')
+      emitter.indent()
+      emit_found()
+      emitter.dedent()
+
+  def _emit_value(self, emitter, token):
+    # like Context.get_string(), absent values are not stringified or escaped
+    def emit_found():
+      emitter.line('if not isinstance(string, str):')
+      emitter.indent()
+      emitter.line('string = stringify(string)')
+      emitter.dedent()
+      if not token.verbatim:
+        emitter.line('if escape is not None:')
+        emitter.indent()
+        emitter.line('string = escape(string)')
+        emitter.dedent()
+    self._emit_lookup(emitter, token.key, 'string', "''", emit_found)
+    # ValueToken wraps the write in push_indent() and pop_indent(), but the
+    # string is only flushed by a later write with the outer indent again,
+    # so the pair does not change the output
+    emitter.line('write(string)')
+
+  def _emit_partial(self, emitter, token, level):
+    if token.linked is not None:
+      emitter.line('push_indent()')
+      emitter.line('{}.render_with(context, buf)', emitter.const(token.linked))
+      emitter.line('buf.remove_trailing()')
+      emitter.line('pop_indent()')
+      return
+    tpl = 'tpl{:d}'.format(level)
+    emitter.line('{} = context.get_partial({!r}, {})', tpl, token.name, emitter.const(token.template))
+    emitter.line('if {} is not None:', tpl)
+    emitter.indent()
+    emitter.line('push_indent()')
+    emitter.line('{}.render_with(context, buf)', tpl)
+    emitter.line('buf.remove_trailing()')
+    emitter.line('pop_indent()')
+    emitter.dedent()
+
+  def _emit_truthy(self, emitter, token, item, level):
+    if token.truthy_content and token.do_push:
+      emitter.line('push({})', item)
+      self._emit_content(emitter, token.truthy_content, level + 1)
+      emitter.line('pop()')
+    else:
+      self._emit_content(emitter, token.truthy_content, level + 1)
+
+  def _emit_falsey(self, emitter, token, level):
+    self._emit_content(emitter, token.falsey_content, level + 1)
+
+  def _emit_section(self, emitter, token, level):
+    value = 'value{:d}'.format(level)
+    item = 'item{:d}'.format(level)
+    if token.mode == 'Loop':
+      self._emit_lookup(emitter, token.key, value, '[]',
+                        lambda: emitter.line('{0} = as_iterable({0})', value))
+      emitter.line('for {} in {}:', item, value)
+      emitter.indent()
+      self._emit_truthy(emitter, token, item, level)
+      emitter.dedent()
+      if token.falsey_content:
+        emitter.line('if not {}:', value)
+        emitter.indent()
+        self._emit_falsey(emitter, token, level)
+        emitter.dedent()
+    elif token.mode == 'Check':
+      self._emit_lookup(emitter, token.key, value, 'None')
+      emitter.line('if {}:', value)
+      emitter.indent()
+      self._emit_truthy(emitter, token, value, level)
+      emitter.dedent()
+      if token.falsey_content:
+        emitter.line('else:')
+        emitter.indent()
+        self._emit_falsey(emitter, token, level)
+        emitter.dedent()
+    else: # 'Enter' or 'Exist', absent keys are never fatal
+      found = 'found{:d}'.format(level)
+      emitter.line('try:')
+      emitter.indent()
+      emitter.line('{} = {}(stack)', value, emitter.const(token.key.accessor))
+      emitter.line('{} = True', found)
+      emitter.dedent()
+      emitter.line('except AbsentError:')
+      emitter.indent()
+      emitter.line('{} = False', found)
+      emitter.dedent()
+      emitter.line('if {}:', found)
+      emitter.indent()
+      self._emit_truthy(emitter, token, value, level)
+      emitter.dedent()
+      if token.falsey_content:
+        emitter.line('else:')
+        emitter.indent()
+        self._emit_falsey(emitter, token, level)
+        emitter.dedent()
+
+
+_default_compiler = Compiler()
+
+def compile_template(template):
+  return _default_compiler.compile(template)
@@ -20,6 +20,120 @@ def _default_lookup(obj, field):
         raise AbsentError('Could not find member "{}"'.format(field))
 
 
+def _lookup_item(obj, field):
+  try:
+    return obj[field]
+  except KeyError:
+    raise AbsentError('Could not find key "{}"'.format(field))
+  except TypeError:
+    return _lookup_attr(obj, field)
+
+def _lookup_attr(obj, field):
+  try:
+    return getattr(obj, field)
+  except AttributeError:
+    raise AbsentError('Could not find member "{}"'.format(field))
+
+def _lookup_protocol(obj, field):
+  try:
+    return obj._lookup_field(field)
+  except KeyError:
+    raise AbsentError('Could not find key "{}"'.format(field))
+  except AttributeError:
+    raise AbsentError('Could not find member "{}"'.format(field))
+
+def _select_strategy(cls, field):
+  if hasattr(cls, '_lookup_field') and not issubclass(cls, type):
+    return _lookup_protocol
+  # classes may still be subscriptable through __class_getitem__
+  elif hasattr(cls, '__getitem__') or issubclass(cls, type):
+    return _lookup_item
+  else:
+    return _lookup_attr
+
+def _field_getter(field):
+  """
+    Build a callable equivalent to partial(_default_lookup, field=field)
+
+    Numeric fields keep the generic lookup. For other fields, the
+    resolution strategy is selected once per object type and cached
+    within the getter, i.e. once per (type, field):
+      - Types that implement the lookup protocol, i.e. a method
+        _lookup_field(field) that returns the value or raises KeyError
+        or AttributeError, are asked directly.
+      - Types with __getitem__ are tried with item access first.
+      - All other types use attribute access without raising and
+        catching a TypeError from item access first.
+  """
+  try:
+    int(field)
+  except ValueError:
+    pass
+  else:
+    return lambda obj: _default_lookup(obj, field)
+
+  strategies = dict() # type -> strategy(obj, field) for this field
+  def get_field(obj):
+    cls = type(obj)
+    strategy = strategies.get(cls)
+    if strategy is None:
+      strategy = strategies[cls] = _select_strategy(cls, field)
+    return strategy(obj, field)
+  return get_field
+
+
+def compile_accessor(key):
+  """
+    Build a callable that resolves key on a context stack with _default_lookup
+
+      accessor(stack) -> value
+
+    The callable is specialized for the mode and path of key and walks
+    the stack by index instead of slicing it.
+
+    raises AbsentError if the key can not be resolved
+  """
+  top = key.top
+  anchored = key.anchored
+  skip = key.skip
+  first = key.first
+  rest = tuple(_field_getter(field) for field in key.rest)
+
+  if not first:
+    def get_first(stack):
+      idx = len(stack) - top - 1
+      if idx < 0:
+        raise AbsentError('Not enough stack levels to start at {}'.format(top))
+      return stack[idx]
+  else:
+    get_field = _field_getter(first)
+    def get_first(stack):
+      idx = len(stack) - top - 1
+      if idx < 0:
+        raise AbsentError('Not enough stack levels to start at {}'.format(top))
+      stop = idx - 1 if anchored else -1
+      to_skip = skip
+      for idx in range(idx, stop, -1):
+        try:
+          val = get_field(stack[idx])
+        except AbsentError:
+          continue
+        if to_skip > 0:
+          to_skip -= 1
+        else:
+          return val
+      raise AbsentError('Could not find {} in context stack after skipping {}'.format(first, skip - to_skip))
+
+  if not rest:
+    return get_first
+  def get_value(stack):
+    value = get_first(stack)
+    for get_field in rest:
+      value = get_field(value)
+    return value
+  return get_value
+
+
 class Context:
 
   def __init__(self, *context_items, raise_on_absent=False, lookup=None, stringify=None, escape=None, partial=None):
@@ -38,6 +152,18 @@ class Context:
       raise AbsentError('Can not resolve partial "{}"'.format(name))
     return partial
 
+  def direct_access(self):
+    """
+      Return (stack, stringify, escape, raise_on_absent) for generated code
+
+      Generated code (see Compiler) resolves keys with Key.accessor on the
+      stack itself, which is only equivalent with the default lookup.
+      Returns None if a custom lookup function is used.
+    """
+    if self._lookup is not _default_lookup:
+      return None
+    return self._stack, self._stringify, self._escape, self._raise_on_absent
+
   def push(self, item):
     self._stack.append(item)
 
@@ -99,25 +225,25 @@ class Context:
         return None
 
   def _get_value(self, key):
+    if self._lookup is _default_lookup:
+      return key.accessor(self._stack)
     value = self._get_first(key)
     for field in key.rest:
       value = self._lookup(value, field)
     return value
 
   def _get_first(self, key):
-    end = -key.top if key.top > 0 else None
-    start = -key.top - 1 if key.anchored else None
-
-    slice = self._stack[start:end]
-    if not slice:
+    idx = len(self._stack) - key.top - 1
+    if idx < 0:
       raise AbsentError('Not enough stack levels to start at {}'.format(key.top))
     if not key.first:
-      return slice[-1]
+      return self._stack[idx]
     else:
+      stop = idx - 1 if key.anchored else -1
       to_skip = key.skip
-      for item in reversed(slice):
+      for idx in range(idx, stop, -1):
         try:
-          val = self._lookup(item, key.first)
+          val = self._lookup(self._stack[idx], key.first)
           if to_skip > 0:
             to_skip -= 1
           else:
@@ -125,5 +251,3 @@ class Context:
         except AbsentError:
           pass
       raise AbsentError('Could not find {} in context stack after skipping {}'.format(key.first, key.skip - to_skip))
-
-
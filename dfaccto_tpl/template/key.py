@@ -1,5 +1,6 @@
 import re
 
+from .context import compile_accessor
 
 
 class Key:
@@ -91,6 +92,13 @@ class Key:
     self._top = top
     self._mode = mode
     self._path = path
+    self._accessor = compile_accessor(self)
+
+  def __getstate__(self):
+    return (self._top, self._mode, self._path)
+
+  def __setstate__(self, state):
+    self.__init__(*state)
 
   @property
   def top(self):
@@ -111,6 +119,11 @@ class Key:
     """Number of matches to skip"""
     return max(self._mode, 0)
 
+  @property
+  def accessor(self):
+    """Callable resolving this key on a context stack (see context.compile_accessor)"""
+    return self._accessor
+
   @property
   def path(self):
     """Raw path parameter"""
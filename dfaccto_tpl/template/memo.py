@@ -0,0 +1,46 @@
+from collections import OrderedDict, namedtuple
+
+
+MemoInfo = namedtuple('MemoInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class Memo:
+  """
+  Bounded least-recently-used mapping with hit and miss counters.
+
+  (similar to functools.lru_cache, but with explicit keys)
+  """
+
+  def __init__(self, maxsize=128):
+    self._maxsize = maxsize
+    self._entries = OrderedDict()
+    self._hits = 0
+    self._misses = 0
+
+  def get(self, key, create):
+    """
+      Return the entry for key, calling create() to build it if absent
+
+      The least recently used entry is dropped if maxsize is exceeded.
+    """
+    try:
+      value = self._entries[key]
+    except KeyError:
+      self._misses += 1
+      value = create()
+      if self._maxsize > 0:
+        self._entries[key] = value
+        if len(self._entries) > self._maxsize:
+          self._entries.popitem(last=False)
+      return value
+    self._hits += 1
+    self._entries.move_to_end(key)
+    return value
+
+  def clear(self):
+    self._entries.clear()
+    self._hits = 0
+    self._misses = 0
+
+  def info(self):
+    return MemoInfo(self._hits, self._misses, self._maxsize, len(self._entries))
@@ -4,6 +4,7 @@ from enum import Enum, auto
 
 from .key import Key
 from .errors import ParserError
+from .memo import Memo
 from .rendering import Template, LiteralToken, ValueToken, IndirectToken, PartialToken, SectionToken
 
 
@@ -112,6 +113,7 @@ class SectionStack:
   def reset(self):
     self._stack.clear()
     self._stack.append([SecKind.Root, None, SectionContainer(), None, None])
+    self._update_content()
 
   @property
   def top(self):
@@ -127,10 +129,14 @@ class SectionStack:
 
   @property
   def content(self):
+    return self._content
+
+  def _update_content(self):
+    # cache the active container of the top item, as every token appends to it
     if self._stack[-1][0].active_content:
-      return self._stack[-1][2]
+      self._content = self._stack[-1][2]
     else:
-      return self._stack[-1][3]
+      self._content = self._stack[-1][3]
 
   @property
   def pos(self):
@@ -145,18 +151,23 @@ class SectionStack:
 
   def push_normal(self, key, pos):
     self._stack.append([SecKind.Normal, key, SectionContainer(), None, pos])
+    self._update_content()
 
   def push_enter(self, key, pos):
     self._stack.append([SecKind.Enter, key, SectionContainer(), None, pos])
+    self._update_content()
 
   def push_check(self, key, pos):
     self._stack.append([SecKind.Check, key, SectionContainer(), None, pos])
+    self._update_content()
 
   def push_exists(self, key, pos):
     self._stack.append([SecKind.Exist, key, SectionContainer(), None, pos])
+    self._update_content()
 
   def push_inverted(self, key, pos):
     self._stack.append([SecKind.Inverted, key, None, SectionContainer(), pos])
+    self._update_content()
 
   def alternate(self, key, pos):
     if self.key != key:
@@ -167,6 +178,7 @@ class SectionStack:
       self.top[0] = self.kind.alternate
       self.top[3] = SectionContainer()
       self.top[4] = pos
+      self._update_content()
     elif self.kind is SecKind.Root:
       msg = 'Alternative token {} outside section'
       raise ParserError(msg.format(SecKind.Alt.token_str(key)))
@@ -184,6 +196,7 @@ class SectionStack:
                                    self.token_str()))
     if self.kind is not SecKind.Root:
       kind, key, truthy, falsey, pos = self._stack.pop()
+      self._update_content()
       return (key, truthy and truthy.get(), falsey and falsey.get(), kind.mode)
     else:
       msg = 'Closing token {} without open section'
@@ -198,67 +211,18 @@ class SectionStack:
       raise ParserError(msg.format(self.token_str()))
 
   def append_token(self, token):
-    self.content.append_token(token)
+    self._content.append_token(token)
 
   def append_literal(self, literal):
-    self.content.append_literal(literal)
-
-
-class State(Enum):
-  Begin = auto()
-  Space = auto()
-  Print = auto()
-  BeginToken = auto()
-  SpaceToken = auto()
-  BeginTokenSpace = auto()
-  SpaceTokenSpace = auto()
-  Other = auto()
-
-  def next(self, is_token, is_newline, is_space, can_standalone):
-    if is_token:
-      if self is State.Begin and can_standalone:
-        return State.BeginToken
-      elif self is State.Space and can_standalone:
-        return State.SpaceToken
-      else:
-        return State.Other
-    elif is_newline:
-      return State.Begin
-    elif is_space:
-      if self is State.Begin:
-        return State.Space
-      elif self is State.BeginToken:
-        return State.BeginTokenSpace
-      elif self is State.SpaceToken:
-        return State.SpaceTokenSpace
-      else:
-        return State.Other
-    else: # is_print
-      if self is State.Begin:
-        return State.Print
-      else:
-        return State.Other
-
-  @property
-  def is_standalone(self):
-    return self in (State.BeginToken,
-                    State.SpaceToken,
-                    State.BeginTokenSpace,
-                    State.SpaceTokenSpace)
-  @property
-  def discard_before(self):
-    return self in (State.SpaceToken,
-                    State.SpaceTokenSpace)
-
-  @property
-  def discard_after(self):
-    return self in (State.BeginTokenSpace,
-                    State.SpaceTokenSpace)
+    self._content.append_literal(literal)
 
 
 class Parser:
 
-  def __init__(self, start_delim='{{', end_delim='}}'):
+  def __init__(self, start_delim='{{', end_delim='}}', memo_size=256):
+    self._start_delim = start_delim
+    self._end_delim = end_delim
+    self._memo = Memo(memo_size)
     newline = r'\n|\r\n?'
     split_pat = r'({nl})|{start}((?:(?!{stop}).)*){stop}'.format(nl=newline,
                                                                  start=re.escape(start_delim),
@@ -273,6 +237,13 @@ class Parser:
     self._space_pattern = re.compile(r'[ \t]+')
     # self._trailnl_pattern = re.compile(r'{nl}$'.format(nl=newline))
 
+  def __reduce__(self):
+    return (type(self), self.delimiters + (self._memo.info().maxsize,))
+
+  @property
+  def delimiters(self):
+    return (self._start_delim, self._end_delim)
+
   def _decode_token(self, string):
     """
 
@@ -291,145 +262,153 @@ class Parser:
     else:
       return (type, param)
 
-  def _split(self, string):
+  def parse_memo(self, string, **props):
     """
-      Generate a raw item stream from a template string.
-
-        ->(is_token, is_newline, is_space, content, (line, col))
-
-      The template string is split into literals (whitespace or printable),
-      newlines and tokens.
-      Tokens are further decoded (see Parser._decode_token())
-      into a type and parameter field.
+      Parse a template string like parse(), but reuse recently parsed templates
 
-      Each item is additionaly marked with its (line, column)-position
-      within the template string.
+      Templates are memoized by string and props, so repeatedly rendered
+      dynamic templates (see IndirectToken) are only parsed once.
+      Use memo_info() to inspect hit and miss counters.
 
-      raises ParserError for invalid token contents
+      raises ParserError for invalid templates (see Parser.parse())
     """
-    cursor = 0
-    line = 0
-    column_off = 0
-    for match in self._split_pattern.finditer(string):
-      m_newline = match.group(1)
-      m_token = match.group(2)
-      m_start = match.start()
-      m_end = match.end()
-      if cursor < m_start:
-        content = string[cursor:m_start]
-        pos = (line + 1, cursor - column_off + 1)
-        is_space = self._space_pattern.fullmatch(content) is not None
-        yield (False, False, is_space, content, pos)
-      pos = (line + 1, m_start - column_off + 1)
-      if m_newline is not None:
-        yield (False, True, False, m_newline, pos)
-        line += 1
-        column_off = m_end
-      else:
-        try:
-          yield (True, False, False, self._decode_token(m_token), pos)
-        except ParserError as e:
-          e.set_position(pos[0], pos[1])
-          raise e
-      cursor = m_end
-    if cursor < len(string):
-      content = string[cursor:]
-      is_space = self._space_pattern.fullmatch(content) is not None
-      pos = (line + 1, cursor - column_off + 1)
-      yield (False, False, is_space, content, pos)
-
-
-  def _filter(self, iterator):
+    try:
+      key = (string, tuple(sorted(props.items())))
+      hash(key)
+    except TypeError: # unhashable props can not be memoized
+      return self.parse(string, **props)
+    return self._memo.get(key, lambda: self.parse(string, **props))
+
+  def memo_info(self):
+    return self._memo.info()
+
+  def memo_clear(self):
+    self._memo.clear()
+
+  def _emit_token(self, template, sections, kind, param, pos):
+    if kind == '':
+      sections.append_token(ValueToken(template, param))
+    elif kind == '&':
+      sections.append_token(ValueToken(template, param, verbatim=True))
+    elif kind == '*':
+      sections.append_token(IndirectToken(template, param, self))
+    elif kind == '>':
+      sections.append_token(PartialToken(template, param))
+    elif kind == '#':
+      sections.push_normal(param, pos)
+    elif kind == '=':
+      sections.push_enter(param, pos)
+    elif kind == '?':
+      sections.push_check(param, pos)
+    elif kind == '!':
+      sections.push_exists(param, pos)
+    elif kind == '^':
+      sections.push_inverted(param, pos)
+    elif kind == '|':
+      sections.alternate(param, pos)
+    elif kind == '/':
+      key, truthy, falsey, mode = sections.pop(param)
+      token = SectionToken(template, key, truthy, falsey, mode)
+      sections.append_token(token)
+    elif kind == ';':
+      pass # ignore the comment token
+
+  def _is_standalone(self, line):
     """
-      Filter a raw item stream to decode standalone tokens.
-
-        (is_token, is_newline, is_space, content, (line, col))
-        -> (is_token, content, (line, col))
+      Check if the items of a line form a standalone token
 
-      The transformation is performed using a finite state machine (see State)
-      which tracks item patterns at the beginning of a line and
-      detects standalone tokens.
-      Items are gathered in a queue for later modification,
-      i.e. discarding whitespace around standalone tokens.
-      This queue is flushed with each newline item.
+      A line is standalone if it consists of a single token of a
+      standalone type, optionally surrounded by whitespace literals.
+      Returns the index of that token within line or None.
     """
-    state = State.Begin
-    queue = deque()
-    for is_token, is_newline, is_space, content, position in iterator:
-      if is_token:
-        # (is_token, content, position)
-        queue.append((True, content, position))
-      elif is_newline:
-        # flush queue
-        if state.is_standalone:
-          if state.discard_before:
-            queue.popleft()
-          token = queue.popleft()
-          if state.discard_after:
-            queue.popleft()
-          # queue should be empty now
-          yield (True, token[1], token[2])
-          # discard this newline item for standalone tokens
-        else:
-          while queue:
-            yield queue.popleft()
-          # pass this newline item for inline content
-          yield (False, content, position)
-      else:
-        # append literal
-        # (is_token, content, position)
-        queue.append((False, content, position))
-      can_standalone = is_token and content[0] in self._standalone_types
-      state = state.next(is_token, is_newline, is_space, can_standalone)
-    while queue:
-      yield queue.popleft()
+    count = len(line)
+    if count == 1:
+      idx = 0
+    elif count == 2:
+      idx = 0 if type(line[0]) is tuple else 1
+    elif count == 3:
+      idx = 1
+    else:
+      return None
+    for pos, item in enumerate(line):
+      if pos == idx:
+        if type(item) is not tuple or item[0] not in self._standalone_types:
+          return None
+      elif type(item) is not str or self._space_pattern.fullmatch(item) is None:
+        return None
+    return idx
 
   def parse(self, string, name=None, **props):
     """
       Parse a template string into a token list ready for rendering
 
+      The template string is scanned once for newlines and tokens.
+      Tokens are decoded (see Parser._decode_token()) and each line is
+      gathered as a list of literal strings and (type, param, (line, col))
+      token tuples. When the line ends, it is either reduced to its
+      standalone token (discarding surrounding whitespace and the newline)
+      or emitted as is.
+
       raises ParserError for invalid token formats
       raises ParserError for inconsistent section tokens
     """
     template = Template(name, **props)
     sections = SectionStack()
+    append_literal = sections.append_literal
     last_pos = (1,1)
+    line = []
+    line_no = 1
+    cursor = 0
+    column_off = 0
     try:
-      for is_token, content, pos in self._filter(self._split(string)):
-        last_pos = pos
-        if is_token:
-          kind,param = content
-          if kind == '':
-            sections.append_token(ValueToken(template, param))
-          elif kind == '&':
-            sections.append_token(ValueToken(template, param, verbatim=True))
-          elif kind == '*':
-            sections.append_token(IndirectToken(template, param, self))
-          elif kind == '>':
-            sections.append_token(PartialToken(template, param))
-          elif kind == '#':
-            sections.push_normal(param, pos)
-          elif kind == '=':
-            sections.push_enter(param, pos)
-          elif kind == '?':
-            sections.push_check(param, pos)
-          elif kind == '!':
-            sections.push_exists(param, pos)
-          elif kind == '^':
-            sections.push_inverted(param, pos)
-          elif kind == '|':
-            sections.alternate(param, pos)
-          elif kind == '/':
-            key, truthy, falsey, mode = sections.pop(param)
-            token = SectionToken(template, key, truthy, falsey, mode)
-            sections.append_token(token)
-          elif kind == ';':
-            pass # ignore the comment token
+      for match in self._split_pattern.finditer(string):
+        m_start = match.start()
+        if cursor < m_start:
+          line.append(string[cursor:m_start])
+        cursor = match.end()
+        m_newline = match.group(1)
+        if m_newline is None:
+          pos = (line_no, m_start - column_off + 1)
+          try:
+            kind, param = self._decode_token(match.group(2))
+          except ParserError as e:
+            last_pos = pos
+            raise e
+          line.append((kind, param, pos))
+          continue
+        # end of line: emit its items
+        if line:
+          idx = self._is_standalone(line)
+          if idx is not None:
+            kind, param, last_pos = line[idx]
+            self._emit_token(template, sections, kind, param, last_pos)
+          else:
+            for item in line:
+              if type(item) is str:
+                append_literal(item)
+              else:
+                kind, param, last_pos = item
+                self._emit_token(template, sections, kind, param, last_pos)
+            append_literal(m_newline)
+            last_pos = (line_no, m_start - column_off + 1)
+          line.clear()
+        else:
+          append_literal(m_newline)
+          last_pos = (line_no, m_start - column_off + 1)
+        line_no += 1
+        column_off = cursor
+      # incomplete last line is never standalone
+      for item in line:
+        if type(item) is str:
+          append_literal(item)
         else:
-          sections.append_literal(content)
+          kind, param, last_pos = item
+          self._emit_token(template, sections, kind, param, last_pos)
+      if cursor < len(string):
+        append_literal(string[cursor:])
+        last_pos = (line_no, cursor - column_off + 1)
       return template.setup(sections.take())
     except ParserError as e:
       e.set_position(last_pos[0], last_pos[1])
       e.set_source(name)
       raise e
-
@@ -31,38 +31,55 @@ class RenderBuffer:
   def without_trailing(cls, string):
     return cls._TNL.sub('', string)
 
+  _SPECIAL_WS = re.compile(r'[^\S ]')
+  _spaces = dict() # width -> string of spaces
+
+  @classmethod
+  def spaces(cls, width):
+    try:
+      return cls._spaces[width]
+    except KeyError:
+      return cls._spaces.setdefault(width, ' ' * width)
+
   def __init__(self, stream=None, no_indent=False):
     self._buffer = stream or StringIO(newline='')
     self._pre_buffer = None
     self._in_memory = stream is None
     self._no_indent = no_indent
     self._indent_stack = []
+    self._indent = ''
     self._current_line = []
+    self._column = 0 # length of the current line
     self._first = False
 
-  @property
-  def _indent(self):
-    if self._indent_stack:
-      return self._indent_stack[-1]
-    else:
-      return ''
-
   def _write_indent(self):
-    for line, has_newline, last_newline, last_partline in self.split(self._pre_buffer):
-      self._buffer.write(line)
-      if has_newline:
-        self._buffer.write(self._indent)
-      if last_newline:
-        self._current_line.clear()
-        self._current_line.append(self._indent)
-      if last_partline:
-        self._current_line.append(line)
+    string = self._pre_buffer
+    if '\n' not in string and '\r' not in string:
+      # fast path: continue the current line
+      self._buffer.write(string)
+      self._current_line.append(string)
+      self._column += len(string)
+      return
+    indent = self._indent
+    if indent:
+      if '\r' not in string:
+        # str.replace() avoids expanding a substitution template per match
+        self._buffer.write(string.replace('\n', '\n' + indent))
+      else:
+        self._buffer.write(self._NL.sub(lambda m: m.group() + indent, string))
+    else:
+      self._buffer.write(string)
+    tail = string[max(string.rfind('\n'), string.rfind('\r')) + 1:]
+    self._current_line.clear()
+    self._current_line.append(indent)
+    self._current_line.append(tail)
+    self._column = len(indent) + len(tail)
 
   def _write_plain(self):
     self._buffer.write(self._pre_buffer)
 
   def write(self, string):
-    if self._pre_buffer is not None:
+    if self._pre_buffer:
       if self._no_indent:
         self._write_plain()
       else:
@@ -76,15 +93,22 @@ class RenderBuffer:
   def push_indent(self):
     self.write(None) # flush _pre_buffer
     if not self._no_indent:
-      self._indent_stack.append(self.spacify(''.join(self._current_line)))
+      line = ''.join(self._current_line)
+      if self._SPECIAL_WS.search(line) is None:
+        # only spaces remain after spacify(), reuse indent strings by width
+        self._indent = self.spaces(self._column)
+      else:
+        self._indent = self.spacify(line)
+      self._current_line.clear()
+      self._current_line.append(line)
+      self._indent_stack.append(self._indent)
 
   def pop_indent(self):
     if not self._no_indent:
       self._indent_stack.pop()
+      self._indent = self._indent_stack[-1] if self._indent_stack else ''
 
   def finish(self):
     self.write(None) # flush _pre_buffer
     if self._in_memory:
       return self._buffer.getvalue()
-
-
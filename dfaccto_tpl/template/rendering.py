@@ -10,17 +10,39 @@ class Template:
     self._name = name or '<string>'
     self._props = props
     self._content = None
+    self._render_func = None
 
   def __getattr__(self, key):
-    if key in self._props:
-      return self._props[key]
+    props = self.__dict__.get('_props', {}) # may be absent while unpickling
+    if key in props:
+      return props[key]
     else:
       raise AttributeError(key)
 
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    state['_render_func'] = None # generated code can not be pickled
+    return state
+
+  @property
+  def name(self):
+    return self._name
+
   @property
   def props(self):
     return self._props
 
+  @property
+  def content(self):
+    return self._content
+
+  @property
+  def is_compiled(self):
+    return self._render_func is not None
+
+  def set_render_func(self, render_func):
+    self._render_func = render_func
+
   def setprops(self, **props):
     self._props.update(props)
 
@@ -29,7 +51,32 @@ class Template:
     self._content = content
     return self
 
+  def link(self, resolve):
+    """
+      Bind partial tokens to the templates returned by resolve(name, template)
+
+      Linked partials are rendered directly, without asking the Context
+      for the partial. Partials for which resolve() returns None
+      remain unlinked and are looked up while rendering as before.
+    """
+    pending = [self._content]
+    while pending:
+      for token in pending.pop() or ():
+        if isinstance(token, PartialToken):
+          token.link(resolve)
+        elif isinstance(token, SectionToken):
+          pending.append(token.truthy_content)
+          pending.append(token.falsey_content)
+    return self
+
   def render_with(self, context, buf):
+    if self._render_func is not None:
+      self._render_func(context, buf)
+    else:
+      self.interpret(context, buf)
+
+  def interpret(self, context, buf):
+    """Render by walking the token list, even if a render function is attached"""
     for token in self._content:
       token.render_with(context, buf)
 
@@ -69,6 +116,14 @@ class ValueToken:
     self._key = key
     self._verbatim = verbatim
 
+  @property
+  def key(self):
+    return self._key
+
+  @property
+  def verbatim(self):
+    return self._verbatim
+
   def render_with(self, context, buf):
     string = context.get_string(self._key, self._verbatim)
     buf.push_indent()
@@ -85,7 +140,7 @@ class IndirectToken:
 
   def render_with(self, context, buf):
     template_string = context.get_string(self._key, True)
-    template = self._parser.parse(template_string, **self._template.props)
+    template = self._parser.parse_memo(template_string, **self._template.props)
     buf.push_indent()
     template.render_with(context, buf)
     buf.pop_indent()
@@ -96,9 +151,27 @@ class PartialToken:
   def __init__(self, template, name):
     self._template = template
     self._name = name
+    self._linked = None
+
+  @property
+  def template(self):
+    return self._template
+
+  @property
+  def name(self):
+    return self._name
+
+  @property
+  def linked(self):
+    return self._linked
+
+  def link(self, resolve):
+    self._linked = resolve(self._name, self._template)
 
   def render_with(self, context, buf):
-    template = context.get_partial(self._name, self._template)
+    template = self._linked
+    if template is None:
+      template = context.get_partial(self._name, self._template)
     if template is not None:
       buf.push_indent()
       template.render_with(context, buf)
@@ -148,6 +221,10 @@ class SectionToken:
     else:
       raise ParserError('Invalid section mode "{}" must be Loop, Enter, Check or Exist'.format(mode))
 
+  @property
+  def do_push(self):
+    return self._do_push
+
   def _render_truthy(self, context, item, buf):
     if self.truthy_content:
       if self._do_push:
@@ -1,5 +1,10 @@
 import collections.abc as abc
 from collections import namedtuple
+from functools import lru_cache
+from hashlib import sha256
+import os
+from itertools import count
+from operator import attrgetter
 from pathlib import Path
 
 
@@ -15,6 +20,60 @@ def resolve_path(baselist, name):
       return path
   return None
 
+
+class SearchPath:
+  """
+  Resolve relative names against a list of base directories like resolve_path()
+
+  Directory listings and resolved names are kept, so repeated lookups
+  do not touch the filesystem. The first base
+  directory containing a file of the name still takes precedence.
+  refresh() drops the listings to pick up added or removed files.
+  """
+
+  def __init__(self, baselist):
+    self._baselist = tuple(baselist)
+    self._listings = dict() # directory -> names of the files it contains
+    self._resolved = dict() # name -> resolved path or None
+
+  @property
+  def baselist(self):
+    return self._baselist
+
+  def refresh(self):
+    self._listings.clear()
+    self._resolved.clear()
+
+  def _files(self, directory):
+    files = self._listings.get(directory)
+    if files is None:
+      try:
+        with os.scandir(directory) as entries:
+          files = frozenset(entry.name for entry in entries if entry.is_file())
+      except OSError:
+        files = frozenset()
+      self._listings[directory] = files
+    return files
+
+  def resolve(self, name):
+    try:
+      return self._resolved[name]
+    except KeyError:
+      pass
+    path = self._lookup(Path(name))
+    self._resolved[name] = path
+    return path
+
+  def _lookup(self, subpath):
+    if subpath.is_absolute():
+      return None
+    for base in self._baselist:
+      path = base / subpath
+      if path.name in self._files(path.parent):
+        return path
+    return None
+
+
 class DFACCTOError(Exception):
   def __init__(self, msg):
     self.msg = msg
@@ -28,6 +87,26 @@ def safe_str(obj):
     return repr(obj)
 
 
+def file_hash(path):
+  try:
+    return sha256(path.read_bytes()).hexdigest()
+  except OSError:
+    return None
+
+
+@lru_cache(maxsize=None)
+def slot_names(cls):
+  return tuple(key for base in cls.__mro__ for key in getattr(base, '__slots__', ()))
+
+def object_state(obj):
+  """Return a dict of the attributes of obj, from its __dict__ and __slots__"""
+  state = dict(getattr(obj, '__dict__', ()))
+  for key in slot_names(type(obj)):
+    if hasattr(obj, key):
+      state[key] = getattr(obj, key)
+  return state
+
+
 class cached_property:
   def __init__(self, func):
     self._func = func
@@ -35,7 +114,8 @@ class cached_property:
   def __get__(self, obj, cls):
     value = self._func(obj)
     if value is not None:
-      obj.__dict__[self._func.__name__] = value
+      # setattr() keeps the instance attributes compact, unlike obj.__dict__
+      setattr(obj, self._func.__name__, value)
     return value
 
 
@@ -46,16 +126,24 @@ class IndexedObj():
     self._len = len
 
   def __getattr__(self, key):
+    obj = self._obj
+    if hasattr(type(obj), '__getitem__') or isinstance(obj, type):
+      try:
+        return obj[key]
+      except TypeError:
+        pass
+      except KeyError:
+        pass
     try:
-      return self._obj[key]
-    except TypeError:
-      pass
-    except KeyError:
-      pass
-    if hasattr(self._obj, key):
-      return getattr(self._obj, key)
-    else:
-      raise AttributeError
+      return getattr(obj, key)
+    except AttributeError:
+      raise AttributeError(key)
+
+  def _lookup_field(self, key):
+    # template lookup protocol (see template.context._field_getter)
+    if key in IndexedObj._own_names or key in self.__dict__:
+      return object.__getattribute__(self, key)
+    return self.__getattr__(key)
 
   def __str__(self):
     return str(self._obj)
@@ -68,6 +156,8 @@ class IndexedObj():
   def _first(self):
     return self._idx == 0
 
+IndexedObj._own_names = frozenset(dir(IndexedObj))
+
 class IndexIter():
   def __init__(self, lst):
     self._iter = iter(lst)
@@ -95,12 +185,12 @@ class Registry(abc.Iterable):
   def __init__(self):
     self._contents = list()
     self._names = dict()
-    self._idx_cache = dict()
+    self._idx_cache = None # allocated by unique_name()
 
   def clear(self):
     self._contents.clear()
     self._names.clear()
-    self._idx_cache.clear()
+    self._idx_cache = None
 
   def __iter__(self):
     return IndexIter(self._contents)
@@ -125,6 +215,10 @@ class Registry(abc.Iterable):
     self._names[name] = len(self._contents)
     self._contents.append(obj)
 
+  def _lookup_field(self, name):
+    # template lookup protocol (see template.context._field_getter)
+    return self._contents[self._names[name]]
+
   def lookup(self, name):
     if name not in self._names:
       msg = 'Unresolved reference: "{}" is not defined'.format(name)
@@ -135,6 +229,9 @@ class Registry(abc.Iterable):
   def has(self, name):
     return name in self._names
 
+  def index(self, name):
+    return self._names[name]
+
   def names(self):
     return self._names.keys()
 
@@ -146,6 +243,8 @@ class Registry(abc.Iterable):
       yield key, self._contents[idx]
 
   def unique_name(self, prefix):
+    if self._idx_cache is None:
+      self._idx_cache = dict()
     idx = self._idx_cache.get(prefix, 0)
     candidate = prefix
     while candidate in self._names:
@@ -155,88 +254,85 @@ class Registry(abc.Iterable):
     return candidate
 
 
-class UnionFind:
-  def __init__(self):
-    self._root = list()
-    self._groups = dict()
-
-  def new(self):
-    idx = len(self._root)
-    self._root.append(idx)
-    self._groups[idx] = set((idx,))
-    return idx
-
-  def find(self, idx):
-    return self._root[idx]
-
-  def group(self, idx):
-    root = self.find(idx)
-    return self._groups[root]
-
-  def union(self, idx_a, idx_b):
-    root_a = self.find(idx_a)
-    root_b = self.find(idx_b)
-    if root_a == root_b:
-      return root_a
+class _DeferredGroup:
+  __slots__ = ('members', 'resolved', 'value')
 
-    for idx in self._groups[root_b]:
-      self._root[idx] = root_a
-      self._groups[root_a].add(idx)
-    del self._groups[root_b]
-    return root_a
+  def __init__(self, members, resolved=False, value=None):
+    self.members = members
+    self.resolved = resolved
+    self.value = value
 
 
 class DeferredValue:
-  _registry = UnionFind()
-  _callbacks = dict()
-  _values = dict()
-
-  @classmethod
-  def _create(cls, callback):
-    idx = cls._registry.new()
-    cls._callbacks[idx] = callback
-    return idx
-
-  @classmethod
-  def _notify(cls, idx, value):
-    for i in cls._registry.group(idx):
-      callback = cls._callbacks.get(i)
-      if callback:
-        callback(value)
-
-  @classmethod
-  def _assign(cls, idx_a, idx_b):
-    root_a = cls._registry.find(idx_a)
-    root_b = cls._registry.find(idx_b)
-    if root_a in cls._values and root_b in cls._values:
-      raise ValueError('Can not assign already resolved values')
-    elif root_a in cls._values:
-      val_a = cls._values[root_a]
-      cls._notify(idx_b, val_a)
-      cls._registry.union(idx_a, idx_b)
-    elif root_b in cls._values:
-      val_b = cls._values[root_b]
-      cls._notify(idx_a, val_b)
-      cls._registry.union(idx_b, idx_a)
-    else:
-      cls._registry.union(idx_b, idx_a)
+  """
+  Placeholder for a value that is not known yet
+
+  DeferredValues assigned to each other form a group, which resolves to a
+  single value. The on_resolve callbacks of all members are then called
+  with that value in the order the members were created, and released.
+  Groups are merged by size, so each member is moved O(log n) times, and
+  only allocated once a DeferredValue is assigned to another one.
+  All state lives in the DeferredValues and their groups, and is
+  released together with the model holding them.
+  """
+  __slots__ = ('_group', '_seq', '_on_resolve')
 
-  @classmethod
-  def _resolve(cls, idx, value):
-    root = cls._registry.find(idx)
-    if root in cls._values:
-      raise ValueError('Can not resolve already resolved value')
-    cls._notify(idx, value)
-    cls._values[root] = value
+  _counter = count() # creation order, for a stable notification order
 
   def __init__(self, on_resolve):
-    self._idx = self._create(on_resolve)
+    self._seq = next(type(self)._counter)
+    self._on_resolve = on_resolve
+    self._group = None
+
+  @property
+  def _resolved(self):
+    return self._group is not None and self._group.resolved
+
+  def _settle(self, value, target=None):
+    # notify all members of the unresolved group of self and move them
+    # to the resolved target group, which is created if not given
+    group = self._group
+    members = [self] if group is None else sorted(group.members, key=attrgetter('_seq'))
+    for member in members:
+      if member._on_resolve is not None:
+        member._on_resolve(value)
+    if target is None:
+      target = _DeferredGroup(None, True, value)
+    for member in members:
+      member._on_resolve = None
+      member._group = target
+    if group is not None:
+      group.members = None
+
+  def _union(self, other):
+    if other is self:
+      return
+    group_a = self._group if self._group is not None else _DeferredGroup([self])
+    group_b = other._group if other._group is not None else _DeferredGroup([other])
+    if group_a is group_b:
+      return
+    if len(group_a.members) < len(group_b.members):
+      group_a, group_b = group_b, group_a
+    for member in group_b.members:
+      member._group = group_a
+    group_a.members.extend(group_b.members)
+    group_b.members = None
+    self._group = other._group = group_a
 
   def assign(self, other):
     if isinstance(other, DeferredValue):
-      self._assign(self._idx, other._idx)
+      if self._resolved and other._resolved:
+        raise ValueError('Can not assign already resolved values')
+      elif self._resolved:
+        other._settle(self._group.value, self._group)
+      elif other._resolved:
+        self._settle(other._group.value, other._group)
+      else:
+        self._union(other)
     else:
-      self._resolve(self._idx, other)
+      if self._resolved:
+        raise ValueError('Can not resolve already resolved value')
+      self._settle(other)
 
 
 def visit_usage_deps(deps, visited, value):
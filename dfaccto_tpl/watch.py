@@ -0,0 +1,95 @@
+from itertools import chain
+import os
+from pathlib import Path
+import time
+
+
+
+def affects_config(changes, scripts, cfgdirs):
+  """
+    Check if (modified, added, removed) changes may affect a model
+
+    This is the case if one of the config scripts the model was built
+    from changed, or if files were added to or removed from one of the
+    config directories, as they may be found by another script name.
+  """
+  modified, added, removed = changes
+  return (not set(scripts).isdisjoint(chain(modified, removed)) or
+          any(cfgdir in path.parents for path in chain(added, removed) for cfgdir in cfgdirs))
+
+
+class Watcher:
+  """
+  Poll directory trees and single files for changes.
+
+  Change notification facilities like inotify are not available in the
+  standard library, so the watched files are scanned periodically and
+  their modification times and sizes compared to the previous scan.
+  Cache directories and excluded paths (e.g. the output directory) are
+  not scanned.
+  """
+
+  SkipDirs = frozenset(('__pycache__', '__tplcache__', '__cfgcache__'))
+
+  def __init__(self, dirs=(), files=(), exclude=(), interval=0.2):
+    self._dirs = list(dirs)
+    self._files = list(files)
+    self._exclude = set(exclude)
+    self._interval = interval
+    self._stamps = self._scan()
+
+  def add_files(self, files):
+    """Watch additional single files, e.g. config scripts outside of the watched trees"""
+    for path in files:
+      if path not in self._files:
+        self._files.append(path)
+        self._stamp(self._stamps, path)
+
+  @staticmethod
+  def _stamp(stamps, path):
+    try:
+      stat = path.stat()
+    except OSError:
+      return
+    stamps[path] = (stat.st_mtime_ns, stat.st_size)
+
+  def _scan(self):
+    stamps = dict()
+    for base in self._dirs:
+      for dirpath, dirnames, filenames in os.walk(base):
+        dirnames[:] = [name for name in dirnames
+                       if name not in type(self).SkipDirs and Path(dirpath, name) not in self._exclude]
+        for name in filenames:
+          self._stamp(stamps, Path(dirpath, name))
+    for path in self._files:
+      self._stamp(stamps, path)
+    return stamps
+
+  def _update(self, stamps):
+    old, self._stamps = self._stamps, stamps
+    modified = {path for path, stamp in stamps.items() if path in old and old[path] != stamp}
+    return modified, stamps.keys() - old.keys(), old.keys() - stamps.keys()
+
+  def poll(self):
+    """Return the (modified, added, removed) paths since the previous scan without blocking"""
+    return self._update(self._scan())
+
+  def wait(self):
+    """
+      Block until watched files change and return (modified, added, removed) paths
+
+      Changes are collected until a scan finds no further changes, so that
+      files written in several steps are reported once.
+    """
+    while True:
+      time.sleep(self._interval)
+      stamps = self._scan()
+      if stamps != self._stamps:
+        break
+    while True:
+      time.sleep(self._interval)
+      settled = self._scan()
+      if settled == stamps:
+        break
+      stamps = settled
+    return self._update(stamps)
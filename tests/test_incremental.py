@@ -0,0 +1,58 @@
+from contextlib import redirect_stdout
+from io import StringIO
+
+import pytest
+
+from dfaccto_tpl.__main__ import main
+
+
+Design = """
+with Pkg('types'):
+  TypeS('Size', x_min={xmin:d})
+  TypeS('RegMap', x_tsize=T('Size'))
+
+Ent('Leaf', PortI('p', T('RegMap')),
+    x_templates={{File('leaf.tpl'): File('leaf.txt')}})
+"""
+
+
+@pytest.fixture
+def design(tmp_path):
+  (tmp_path / 'cfg').mkdir()
+  (tmp_path / 'tpl').mkdir()
+  (tmp_path / 'tpl' / 'leaf.tpl').write_text('{{#ports}}min={{type.x_tsize.x_min}}{{/ports}}\n')
+
+  def render(xmin):
+    """Render the design incrementally, return (stdout, content of leaf.txt)"""
+    (tmp_path / 'cfg' / 'design.py').write_text(Design.format(xmin=xmin))
+    stdout = StringIO()
+    with redirect_stdout(stdout):
+      assert main(['--no-cache', '--incremental', '-o', str(tmp_path / 'out'), '-e', 'design.py',
+                   '-c', str(tmp_path / 'cfg'), '-t', str(tmp_path / 'tpl')]) == 0
+    output, = (tmp_path / 'out').rglob('leaf.txt')
+    return stdout.getvalue(), output
+  return render
+
+
+def test_unchanged_is_current(design):
+  stdout, output = design(0)
+  assert '(current)' not in stdout
+  stdout, output = design(0)
+  assert '(current)' in stdout
+  assert output.read_text() == 'min=0\n'
+
+
+def test_indirect_change(design):
+  # the template reaches Size through the type of the port and a prop of RegMap
+  design(0)
+  stdout, output = design(5)
+  assert '(current)' not in stdout
+  assert output.read_text() == 'min=5\n'
+
+
+def test_missing_output(design):
+  stdout, output = design(0)
+  output.unlink()
+  stdout, output = design(0)
+  assert '(current)' not in stdout
+  assert output.read_text() == 'min=0\n'
@@ -0,0 +1,58 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+import stat
+import threading
+
+import pytest
+
+from dfaccto_tpl.__main__ import main
+from dfaccto_tpl.client import request
+from dfaccto_tpl.server import RenderServer
+
+
+Root = Path(__file__).resolve().parents[1]
+Example = Root / 'example'
+
+
+def example_argv(outdir):
+  # cache files go next to the outputs, not into the example directories
+  return ['-o', str(outdir), '--cachedir', str(outdir.parent / 'cache'), '-e', 'simple.py',
+          '-c', str(Example / 'cfg'), '-t', str(Example / 'tpl'),
+          '-m', 'lib', '-c', str(Example / 'lib' / 'cfg'), '-t', str(Example / 'lib' / 'tpl')]
+
+
+def tree(outdir):
+  return {path.relative_to(outdir).as_posix(): path.read_bytes()
+          for path in sorted(outdir.rglob('*')) if path.is_file()}
+
+
+@pytest.fixture
+def server(tmp_path):
+  path = tmp_path / 'server.sock'
+  with RenderServer(path, main) as server:
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+      yield path
+    finally:
+      server.shutdown()
+      thread.join()
+      path.unlink()
+
+
+def test_socket_is_private(server):
+  assert stat.S_IMODE(server.stat().st_mode) == 0o600
+
+
+def test_round_trip(server, tmp_path):
+  stdout = StringIO()
+  with redirect_stdout(stdout):
+    assert main(example_argv(tmp_path / 'direct')) == 0
+
+  # the second request reuses the cached model and templates
+  for run in ('served', 'served_again'):
+    status, served_stdout, stderr = request(server, example_argv(tmp_path / run), cwd=str(Root))
+    assert (status, stderr) == (0, '')
+    assert served_stdout == stdout.getvalue().replace(str(tmp_path / 'direct'), str(tmp_path / run))
+    assert tree(tmp_path / run) == tree(tmp_path / 'direct')